@@ -0,0 +1 @@
+"""Data access and lookup helpers shared by the LGD Streamlit app."""
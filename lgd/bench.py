@@ -0,0 +1,273 @@
+"""Benchmarks for loading, search and hierarchy aggregation.
+
+Runs on synthetic, LGD-shaped CSVs (same files, columns and hierarchy labels
+as ``Data/``) generated at any scale, so it needs neither the network nor
+Streamlit. For each scale it times:
+
+* ``cold_load``  - parsing the CSVs and building the columnar cache (``lgd.data.ingest``)
+* ``warm_load``  - loading the dataset from that cache (``lgd.data.load_dataset``)
+* ``search_index`` / ``search`` - building the search indexes, then per-query
+  latency percentiles for a mix of names, prefixes, substrings, codes and misses
+* ``fuzzy_index`` / ``fuzzy_search`` - the same for fuzzy village name matching
+* ``hierarchy_index`` / ``state_wise_records`` - the drill-down index and the
+  per-state aggregation
+
+along with the peak resident memory of each stage. Results are written as
+JSON; pass an earlier run to ``--compare`` to print the change per metric::
+
+    python -m lgd.bench --villages 10000 100000 1000000 -o bench.json
+    python -m lgd.bench --villages 100000 --compare bench.json
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from lgd import data, summary
+from lgd.fuzzy import build_fuzzy_index
+from lgd.hierarchy import HierarchyIndex
+from lgd.metrics import rss_bytes
+from lgd.search import build_indexes
+
+DEFAULT_SCALES = [10_000, 100_000, 1_000_000]
+DEFAULT_QUERIES = 200
+# Roughly the shape of the real directory: ~650k villages in 36 states, ~780 districts, ~7k sub-districts
+STATES = 36
+VILLAGES_PER_DISTRICT = 850
+VILLAGES_PER_SUB_DISTRICT = 95
+_SYLLABLES = ["ra", "ma", "pur", "ga", "nj", "ka", "la", "sa", "ha", "ba", "na", "di", "ko", "tu", "li", "ve",
+              "ch", "an", "ar", "ni", "pa", "ta", "kh", "dh", "wa", "ya", "ri", "sh", "ol", "nd", "gar", "hal",
+              "pet", "ur", "va", "ji", "mu", "do", "be", "se"]
+_SUFFIXES = ["", "", "", " Khurd", " Kalan", " Tola", " Chak", " Nagar"]
+# Sampling interval of the resident-memory monitor, in seconds
+RSS_INTERVAL = 0.005
+
+
+def _names(rng: np.random.Generator, n: int, prefix: str = "") -> pd.Series:
+    # Two to four syllables plus an occasional suffix: plenty of repeats, like real village names
+    syllables = np.array(_SYLLABLES, dtype=object)
+    parts = syllables[rng.integers(0, len(syllables), (n, 4))]
+    lengths = rng.integers(2, 5, n)
+    names = pd.Series(prefix + parts[:, 0]) + parts[:, 1]
+    for k in (2, 3):
+        names = names + np.where(lengths > k, parts[:, k], "")
+    names = names.str.capitalize()
+    return names + np.array(_SUFFIXES, dtype=object)[rng.integers(0, len(_SUFFIXES), n)]
+
+
+def synthetic_dataset(villages: int, out_dir: Path, seed: int = 0) -> None:
+    """Write the four LGD CSVs for a directory of ``villages`` villages to ``out_dir``."""
+    rng = np.random.default_rng(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    n_districts = max(STATES, villages // VILLAGES_PER_DISTRICT)
+    n_sub_districts = max(n_districts, villages // VILLAGES_PER_SUB_DISTRICT)
+
+    state_codes = np.arange(1, STATES + 1)
+    state_names = _names(rng, STATES, "State ").to_numpy()
+    pd.DataFrame({"S.No.": state_codes, "State LGD Code": state_codes, "State Name (In English)": state_names,
+                  "State Name (In Local language)": state_names, "State or UT": np.where(state_codes <= 28, "S", "U"),
+                  "Census2011 Code": state_codes}).to_csv(out_dir / data.STATE_FILE, index=False)
+
+    # Every state gets at least one district and every district at least one sub-district
+    district_codes = np.arange(1, n_districts + 1) + 100
+    district_state = np.concatenate([np.arange(STATES), rng.integers(0, STATES, n_districts - STATES)])
+    district_names = _names(rng, n_districts).to_numpy()
+    pd.DataFrame({"S.No.": np.arange(1, n_districts + 1), "District LGD Code": district_codes,
+                  "District Name (In English)": district_names, "District Name (In Local language)": district_names,
+                  "Hierarchy": pd.Series(state_names[district_state]) + "(State)",
+                  "Short Name of District": district_names, "Census2011 Code": district_codes,
+                  "Pesa Status": "N"}).to_csv(out_dir / data.DISTRICT_FILE, index=False)
+
+    sub_district_codes = np.arange(1, n_sub_districts + 1) + 10_000
+    sub_district_district = np.concatenate([np.arange(n_districts),
+                                            rng.integers(0, n_districts, n_sub_districts - n_districts)])
+    sub_district_state = district_state[sub_district_district]
+    sub_district_names = _names(rng, n_sub_districts).to_numpy()
+    pd.DataFrame({"S.No.": np.arange(1, n_sub_districts + 1), "Sub-District LGD Code": sub_district_codes,
+                  "Sub-District Name (In English)": sub_district_names,
+                  "Sub-District Name (In Local language)": sub_district_names,
+                  "Hierarchy": (pd.Series(district_names[sub_district_district]) + "(District) / "
+                                + state_names[sub_district_state] + "(State)"),
+                  "Census2011 Code": sub_district_codes, "Pesa Status": "N"}
+                 ).to_csv(out_dir / data.SUB_DISTRICT_FILE, index=False)
+
+    parent = rng.integers(0, n_sub_districts, villages)
+    district = sub_district_district[parent]
+    state = sub_district_state[parent]
+    village_names = _names(rng, villages)
+    pd.DataFrame({"S.No.": np.arange(1, villages + 1), "State Code": state_codes[state],
+                  "State Name (In English)": state_names[state], "District Code": district_codes[district],
+                  "District Name (In English)": district_names[district],
+                  "Sub-District Code": sub_district_codes[parent],
+                  "Sub-District Name (In English)": sub_district_names[parent],
+                  "Village Code": np.arange(1, villages + 1) + 100_000, "Village Version": rng.integers(1, 4, villages),
+                  "Village Name (In English)": village_names, "Village Name (In Local)": village_names,
+                  "Village Status": "Inhabitant", "Census 2011 Code": np.arange(1, villages + 1) + 500_000}
+                 ).to_csv(out_dir / data.VILLAGE_FILE, index=False)
+
+
+def query_mix(villages: pd.DataFrame, n: int, seed: int = 0) -> List[str]:
+    """Search terms as users type them: full names, prefixes, substrings, codes and misses."""
+    rng = np.random.default_rng(seed)
+    names = villages["Village Name (In English)"].to_numpy()[rng.integers(0, len(villages), n)]
+    codes = villages["Village Code"].to_numpy()[rng.integers(0, len(villages), n)]
+    kinds = [
+        lambda i: str(names[i]),
+        lambda i: str(names[i])[:2],
+        lambda i: str(names[i])[1:5],
+        lambda i: str(codes[i]),
+        lambda i: str(codes[i])[:4],
+        lambda i: f"zzq{i}",
+    ]
+    return [kinds[i % len(kinds)](i) for i in range(n)]
+
+
+class PeakMemory:
+    """Peak resident memory while the ``with`` block runs, sampled by a background thread.
+
+    Falls back to the process-wide peak (``ru_maxrss``) where ``/proc`` is
+    unavailable, and reports 0 where that is too (Windows).
+    """
+
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(RSS_INTERVAL):
+            self.peak = max(self.peak, rss_bytes() or 0)
+
+    def __enter__(self) -> "PeakMemory":
+        if rss_bytes() is not None:
+            self.peak = rss_bytes()
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._thread.is_alive():
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, rss_bytes())
+        else:
+            try:
+                import resource
+            except ImportError:
+                return
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def measure(stage: Callable[[], object]) -> tuple:
+    """Run ``stage`` once and return ``(result, {"seconds", "peak_rss_mib"})``."""
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        result = stage()
+        seconds = time.perf_counter() - start
+    return result, {"seconds": round(seconds, 4), "peak_rss_mib": round(memory.peak / 2 ** 20, 1)}
+
+
+def latencies(lookup: Callable[[str], object], queries: List[str]) -> Dict[str, float]:
+    """Per-query latency percentiles of ``lookup`` over ``queries``, in milliseconds."""
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        lookup(query)
+        times.append((time.perf_counter() - start) * 1000)
+    return percentiles(times)
+
+
+def percentiles(times: List[float]) -> Dict[str, float]:
+    """Summary of per-query latencies given in milliseconds."""
+    p50, p90, p99 = np.percentile(times, [50, 90, 99])
+    return {"queries": len(times), "p50_ms": round(p50, 3), "p90_ms": round(p90, 3), "p99_ms": round(p99, 3),
+            "max_ms": round(max(times), 3), "mean_ms": round(float(np.mean(times)), 3)}
+
+
+def run_scale(villages: int, queries: int = DEFAULT_QUERIES, seed: int = 0, fuzzy: bool = True) -> dict:
+    """Benchmark every stage on a freshly generated dataset of ``villages`` villages."""
+    result = {"villages": villages, "stages": {}}
+    stages = result["stages"]
+    with tempfile.TemporaryDirectory(prefix="lgd-bench-") as tmp:
+        data_dir, cache_dir = Path(tmp) / "Data", Path(tmp) / "cache"
+        # Nothing is fetched: every source file exists locally
+        base_url = "file:///nonexistent/"
+        synthetic_dataset(villages, data_dir, seed)
+
+        _, stages["cold_load"] = measure(lambda: data.ingest(data_dir, cache_dir, base_url))
+        dataset, stages["warm_load"] = measure(lambda: data.load_dataset(base_url, data_dir, cache_dir))
+        result["rows"] = {name: len(getattr(dataset, name)) for name in data.TABLES}
+
+        terms = query_mix(dataset.villages, queries, seed)
+        indexes, stages["search_index"] = measure(lambda: build_indexes(dataset))
+        percentiles, stages["search"] = measure(lambda: latencies(indexes["villages"].search, terms))
+        stages["search"].update(percentiles)
+
+        if fuzzy:
+            fuzzy_index, stages["fuzzy_index"] = measure(lambda: build_fuzzy_index(dataset, "villages"))
+            # Every sixth term of the mix is a full village name
+            percentiles, stages["fuzzy_search"] = measure(lambda: latencies(fuzzy_index.search, terms[::6]))
+            stages["fuzzy_search"].update(percentiles)
+
+        _, stages["hierarchy_index"] = measure(lambda: HierarchyIndex(dataset))
+        _, stages["state_wise_records"] = measure(lambda: summary.state_wise_records(dataset))
+    return result
+
+
+def environment() -> dict:
+    import pyarrow
+    return {"python": platform.python_version(), "platform": platform.platform(), "numpy": np.__version__,
+            "pandas": pd.__version__, "pyarrow": pyarrow.__version__}
+
+
+def compare(current: dict, baseline: dict) -> List[str]:
+    """One line per timed metric present in both runs: baseline, current and the ratio between them."""
+    lines = []
+    previous = {run["villages"]: run["stages"] for run in baseline.get("runs", [])}
+    for run in current["runs"]:
+        for stage, metrics in run["stages"].items():
+            for metric, value in metrics.items():
+                old = previous.get(run["villages"], {}).get(stage, {}).get(metric)
+                if metric == "queries" or not old:
+                    continue
+                lines.append(f"{run['villages']:>10,} {stage:<20} {metric:<14} {old:>12} -> {value:>12}"
+                             f"  x{value / old:.2f}")
+    return lines
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark LGD loading, search and aggregation on synthetic data.")
+    parser.add_argument("--villages", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="dataset sizes to benchmark, in villages (default: %(default)s)")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="search queries per scale")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-fuzzy", action="store_true", help="skip the fuzzy index stages")
+    parser.add_argument("-o", "--output", default="-", help="JSON results file ('-' for stdout)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = {"benchmark": "lgd", "environment": environment(), "runs": []}
+    for villages in args.villages:
+        print(f"benchmarking {villages:,} villages", file=sys.stderr)
+        results["runs"].append(run_scale(villages, args.queries, args.seed, fuzzy=not args.no_fuzzy))
+
+    text = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        Path(args.output).write_text(text + "\n")
+    if args.compare:
+        print("\n".join(compare(results, json.loads(Path(args.compare).read_text()))), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
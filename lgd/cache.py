@@ -0,0 +1,366 @@
+"""Local columnar cache for the LGD tables.
+
+Each table is stored as an uncompressed Feather (Arrow IPC) file so it can be
+memory-mapped at startup. ``manifest.json`` records where every cached table
+came from: the SHA-256 of the source CSV (a Git LFS pointer's ``oid`` counts
+as the checksum of the file it points to) and, for remote downloads, the
+server ``ETag``. A cached table is reused until that checksum or ETag changes.
+Downloads are checked against the LFS pointer they stand in for; when the
+server has moved on to other content, the cache follows what was actually
+downloaded (its ETag) instead of the pointer.
+
+Build the cache offline with::
+
+    python -m lgd.cache --data-dir Data --cache-dir .lgd_cache
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import requests
+
+from lgd import metrics
+
+# Bump whenever the cached table layout (columns/dtypes/chunking) changes
+SCHEMA_VERSION = 3
+MANIFEST = "manifest.json"
+METADATA = "metadata.json"
+HTTP_TIMEOUT = 60
+# Freshness checks run at startup, so they give up quickly and fall back to the cache
+HEAD_TIMEOUT = 5
+HTTP_RETRIES = 3
+RETRY_BACKOFF = 1.0
+LFS_POINTER_PREFIX = b"version https://git-lfs.github.com/spec/v1"
+
+logger = logging.getLogger("lgd.cache")
+
+
+def source_checksum(path: Path) -> Optional[str]:
+    """SHA-256 of a local CSV, or the ``oid`` recorded in its Git LFS pointer."""
+    if not path.is_file():
+        return None
+    with open(path, "rb") as f:
+        head = f.read(len(LFS_POINTER_PREFIX))
+        if head == LFS_POINTER_PREFIX:
+            for line in f.read().decode().splitlines():
+                if line.startswith("oid sha256:"):
+                    return line.split(":", 1)[1].strip()
+            return None
+        digest = hashlib.sha256(head)
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_lfs_pointer(path: Path) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(LFS_POINTER_PREFIX)) == LFS_POINTER_PREFIX
+
+
+# Tables are loaded concurrently; manifest updates are read-modify-write
+_manifest_lock = threading.Lock()
+MANIFEST_LOCK = "manifest.lock"
+
+
+def fetch(url: str) -> requests.Response:
+    """GET ``url``, retrying connection errors, timeouts and 5xx responses with exponential backoff."""
+    for attempt in range(HTTP_RETRIES):
+        if attempt:
+            time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+        try:
+            response = requests.get(url, timeout=HTTP_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == HTTP_RETRIES - 1:
+                raise
+            continue
+        if response.status_code < 500:
+            break
+    response.raise_for_status()
+    return response
+
+
+def read_manifest(cache_dir: Path) -> dict:
+    try:
+        with open(cache_dir / MANIFEST, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+@contextmanager
+def _file_lock(path: Path):
+    # Exclusive flock on ``path`` where fcntl is available; elsewhere (or when it cannot be created) no-op
+    try:
+        import fcntl
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle = open(path, "w")
+    except (ImportError, OSError):
+        yield
+        return
+    with handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+@contextmanager
+def manifest_lock(cache_dir: Path):
+    """Held around every read-modify-write of the manifest and metadata, by threads and processes alike."""
+    with _manifest_lock, _file_lock(cache_dir / MANIFEST_LOCK):
+        yield
+
+
+@contextmanager
+def _replacing(path: Path):
+    # Yields a unique temporary path beside ``path`` and moves it over ``path`` once written,
+    # so concurrent writers never share (or remove) each other's temporary file
+    handle, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    os.close(handle)
+    try:
+        yield Path(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _write_json(path: Path, content: dict) -> None:
+    with _replacing(path) as tmp:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(content, f, indent=2, sort_keys=True, ensure_ascii=False)
+
+
+def data_version(cache_dir: Path) -> Optional[str]:
+    """Identifies the cached data: a digest of every table's schema and source checksum."""
+    manifest = read_manifest(cache_dir)
+    if not manifest:
+        return None
+    sources = {name: [entry.get("schema"), entry.get("sha256")] for name, entry in manifest.items()}
+    return hashlib.sha256(json.dumps(sources, sort_keys=True).encode()).hexdigest()
+
+
+def read_metadata(cache_dir: Path) -> dict:
+    """Derived figures stored for the current data version (empty when absent or outdated)."""
+    try:
+        with open(cache_dir / METADATA, encoding="utf-8") as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return metadata if metadata.get("version") == data_version(cache_dir) else {}
+
+
+def write_metadata(cache_dir: Path, metadata: dict) -> None:
+    try:
+        with manifest_lock(cache_dir):
+            _write_json(cache_dir / METADATA, dict(metadata, version=data_version(cache_dir)))
+    except OSError:
+        pass
+
+
+@contextmanager
+def staging(cache_dir: Path):
+    """A scratch copy of ``cache_dir`` to build and check an update in, removed afterwards.
+
+    Files are hard-linked where possible: cache files are only ever replaced
+    (see :func:`_replacing`), never written in place, so the live cache is untouched.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    stage = Path(tempfile.mkdtemp(dir=cache_dir.parent, prefix=f".{cache_dir.name}.staging-"))
+    try:
+        for path in cache_dir.iterdir():
+            if path.suffix in (".feather", ".json"):
+                try:
+                    os.link(path, stage / path.name)
+                except OSError:
+                    shutil.copy2(path, stage / path.name)
+        yield stage
+    finally:
+        shutil.rmtree(stage, ignore_errors=True)
+
+
+def publish(stage: Path, cache_dir: Path) -> None:
+    """Move a staged cache over ``cache_dir``: the tables first, then the manifest and metadata describing them.
+
+    Processes still mapping the old table files keep reading them until they reload.
+    """
+    with manifest_lock(cache_dir):
+        for name in sorted(path.name for path in stage.glob("*.feather")) + [MANIFEST, METADATA]:
+            if (stage / name).exists():
+                os.replace(stage / name, cache_dir / name)
+
+
+def table_path(cache_dir: Path, name: str) -> Path:
+    return cache_dir / f"{name}.feather"
+
+
+# Text columns stay Arrow-backed instead of being expanded into Python str objects
+_ARROW_STRINGS = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}
+
+
+def read_table(path: Path) -> pd.DataFrame:
+    """Memory-map a cached table; numeric columns are not copied on load."""
+    return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True, types_mapper=_ARROW_STRINGS.get)
+
+
+def is_fresh(entry: dict, local_path: Path, url: str) -> bool:
+    """Whether a manifest entry still matches its source."""
+    if entry.get("schema") != SCHEMA_VERSION:
+        return False
+    expected = source_checksum(local_path)
+    if expected is not None and entry.get("sha256") == expected:
+        return True
+    if expected is not None and not is_lfs_pointer(local_path):
+        return False
+    # Downloaded: there is no local CSV, or the LFS pointer names other content than
+    # BASE_URL served (its branch has moved on), so compare with what the server has now
+    if entry.get("etag"):
+        try:
+            etag = requests.head(url, timeout=HEAD_TIMEOUT, allow_redirects=True).headers.get("ETag")
+        except requests.RequestException:
+            # Offline (restricted egress): keep serving the cache we have
+            return True
+        return etag is None or etag == entry["etag"]
+    return expected is None
+
+
+def parse_source(name: str, reader: Callable[..., pd.DataFrame], local_path: Path,
+                 url: str) -> Tuple[pd.DataFrame, str, Optional[str]]:
+    """Parse one table from its local CSV (or ``url``); returns the frame, the source checksum and ETag."""
+    if local_path.is_file() and not is_lfs_pointer(local_path):
+        with metrics.stage("parse", table=name):
+            return reader(local_path), source_checksum(local_path), None
+    with metrics.stage("download", table=name):
+        response = fetch(url)
+    with metrics.stage("parse", table=name):
+        df = reader(BytesIO(response.content))
+    checksum = hashlib.sha256(response.content).hexdigest()
+    expected = source_checksum(local_path)
+    if expected is not None and checksum != expected:
+        logger.warning("%s: %s served sha256 %s, not the LFS object %s that %s points to; caching what was served",
+                       name, url, checksum, expected, local_path)
+    return df, checksum, response.headers.get("ETag")
+
+
+def store(name: str, table: pa.Table, cache_dir: Path, checksum: str, etag: Optional[str]) -> None:
+    """Write one table to ``cache_dir`` and record its source in the manifest."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # A single record batch lets readers map numeric columns straight into pandas without a copy
+    with _replacing(table_path(cache_dir, name)) as tmp:
+        feather.write_feather(table.combine_chunks(), tmp, compression="uncompressed",
+                              chunksize=max(table.num_rows, 1))
+    record_source(name, cache_dir, checksum, etag, table.num_rows)
+
+
+def record_source(name: str, cache_dir: Path, checksum: str, etag: Optional[str], rows: int) -> None:
+    """Update one table's manifest entry (the cached file already matches that source)."""
+    with manifest_lock(cache_dir):
+        manifest = read_manifest(cache_dir)
+        manifest[name] = {"schema": SCHEMA_VERSION, "sha256": checksum, "etag": etag, "rows": rows}
+        _write_json(cache_dir / MANIFEST, manifest)
+
+
+def build(name: str, reader: Callable[..., pd.DataFrame], local_path: Path, url: str,
+          cache_dir: Optional[Path]) -> pd.DataFrame:
+    """Parse one table from its local CSV (or ``url``) and store it in ``cache_dir``."""
+    df, checksum, etag = parse_source(name, reader, local_path, url)
+    if cache_dir is None:
+        return df
+    try:
+        store(name, pa.Table.from_pandas(df, preserve_index=False), cache_dir, checksum, etag)
+    except OSError:
+        # A read-only cache directory only costs us the warm start
+        pass
+    return df
+
+
+def _read_if_fresh(name: str, local_path: Path, url: str, cache_dir: Path) -> Optional[pd.DataFrame]:
+    entry = read_manifest(cache_dir).get(name)
+    path = table_path(cache_dir, name)
+    with metrics.stage("freshness_check", table=name):
+        fresh = entry and path.is_file() and is_fresh(entry, local_path, url)
+    if not fresh:
+        return None
+    with metrics.stage("cache_read", table=name):
+        return read_table(path)
+
+
+@contextmanager
+def build_lock(cache_dir: Path, name: str):
+    """Held while one table is rebuilt, so workers starting together download and parse it once.
+
+    Exclusive across processes where ``fcntl`` is available; elsewhere (or in a
+    read-only cache directory) it does not lock.
+    """
+    with _file_lock(cache_dir / f"{name}.lock"):
+        yield
+
+
+def load(name: str, reader: Callable[..., pd.DataFrame], local_path: Path, url: str,
+         cache_dir: Optional[Path]) -> pd.DataFrame:
+    """Return a table from the cache, rebuilding it when it is missing or stale.
+
+    Tables come back memory-mapped from the cache file, even right after a
+    rebuild, so every process serving the app shares one copy through the OS
+    page cache. Their numeric columns are read-only.
+    """
+    if cache_dir is None:
+        return build(name, reader, local_path, url, cache_dir)
+    cache_dir = Path(cache_dir)
+    df = _read_if_fresh(name, local_path, url, cache_dir)
+    if df is not None:
+        return df
+    with build_lock(cache_dir, name):
+        # Another process may have rebuilt it while we waited
+        df = _read_if_fresh(name, local_path, url, cache_dir)
+        if df is not None:
+            return df
+        df, checksum, etag = parse_source(name, reader, local_path, url)
+        try:
+            store(name, pa.Table.from_pandas(df, preserve_index=False), cache_dir, checksum, etag)
+        except OSError:
+            # A read-only cache directory only costs us the warm start (and sharing)
+            return df
+    return read_table(table_path(cache_dir, name))
+
+
+def main(argv=None) -> None:
+    from lgd import data
+
+    parser = argparse.ArgumentParser(description="Build the local LGD columnar cache.")
+    parser.add_argument("--data-dir", type=Path, default=data.DATA_DIR, help="directory holding the LGD CSVs")
+    parser.add_argument("--cache-dir", type=Path, default=data.CACHE_DIR, help="where to write the cache")
+    parser.add_argument("--base-url", default=data.BASE_URL, help="remote fallback for CSVs missing locally")
+    args = parser.parse_args(argv)
+
+    from lgd.validate import DataValidationError
+
+    try:
+        data.ingest(args.data_dir, args.cache_dir, args.base_url)
+    except DataValidationError as e:
+        sys.exit(f"{e}\nnot applied; the cache is unchanged (details: python -m lgd.validate)")
+    memory = read_metadata(args.cache_dir).get("memory", {})
+    for name, entry in sorted(read_manifest(args.cache_dir).items()):
+        usage = memory.get(name, {})
+        print(f"{name}: {entry['rows']} rows, sha256 {entry['sha256'][:12]}, "
+              f"{usage.get('bytes', 0) / 2 ** 20:.1f} MiB in memory ({usage.get('bytes_per_row', 0)} bytes/row)")
+
+
+if __name__ == "__main__":
+    main()
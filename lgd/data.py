@@ -0,0 +1,197 @@
+"""Single loader for the four LGD datasets.
+
+Every part of the app (KPI tiles, the search sections and the State Wise
+Records table) used to fetch and parse its own copy of the CSVs. Everything
+now goes through :func:`load_dataset`, which reads each file exactly once and
+hands the same frames to every section.
+
+Parsed tables are kept in a local columnar cache (see :mod:`lgd.cache`), so a
+warm start never touches the network or the CSV parser.
+
+A loaded :class:`LGDDataset` is shared, not copied: one instance serves every
+session of a process, and its tables are memory-mapped from the cache files,
+so every process on the host shares the same pages. Treat it as immutable:
+select, filter and ``copy()`` freely, but never assign into a table or the
+metadata. Numeric columns are read-only and raise ``ValueError`` if written.
+
+The readers below are the only place data is cleaned (typed, missing codes
+set to 0). The cleaned tables are validated once per data version (see
+:mod:`lgd.validate`), and :func:`load_dataset` raises
+:class:`~lgd.validate.DataValidationError` for a dataset with errors instead
+of repairing it at run time.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Dict, Optional
+
+import pandas as pd
+
+from lgd import cache, summary, validate
+
+BASE_URL = os.environ.get("LGD_BASE_URL",
+                          "https://media.githubusercontent.com/media/sjpradhan/lgd_hierarchy/main/Data/")
+DATA_DIR = Path(os.environ.get("LGD_DATA_DIR", Path(__file__).resolve().parent.parent / "Data"))
+CACHE_DIR = Path(os.environ.get("LGD_CACHE_DIR", Path(__file__).resolve().parent.parent / ".lgd_cache"))
+
+STATE_FILE = "State Details.csv"
+DISTRICT_FILE = "District Details.csv"
+SUB_DISTRICT_FILE = "Sub-districts Details.csv"
+VILLAGE_FILE = "Village Details.csv"
+
+STATE_COLUMNS = ["State LGD Code", "State Name (In English)", "State Name (In Local language)", "State or UT",
+                 "Census2011 Code"]
+DISTRICT_COLUMNS = ["District LGD Code", "District Name (In English)", "District Name (In Local language)",
+                    "Hierarchy", "Short Name of District", "Census2011 Code", "Pesa Status"]
+SUB_DISTRICT_COLUMNS = ["Sub-District LGD Code", "Sub-District Name (In English)",
+                        "Sub-District Name (In Local language)", "Hierarchy", "Census2011 Code", "Pesa Status"]
+VILLAGE_COLUMNS = ["State Code", "State Name (In English)", "District Code", "District Name (In English)",
+                   "Sub-District Code", "Sub-District Name (In English)", "Village Code", "Village Version",
+                   "Village Name (In English)", "Village Name (In Local)", "Village Status", "Census 2011 Code"]
+
+# Explicit dtypes for the cached tables. Codes are int32 (missing codes become 0, as the
+# app always displayed them); low-cardinality names and flags are categoricals and the
+# ~650k distinct village names live in Arrow string arrays rather than Python objects.
+STATE_DTYPES = {"State LGD Code": "int32", "State or UT": "category", "Census2011 Code": "int32"}
+DISTRICT_DTYPES = {"District LGD Code": "int32", "Census2011 Code": "int32", "Pesa Status": "category"}
+SUB_DISTRICT_DTYPES = {"Sub-District LGD Code": "int32", "Census2011 Code": "int32", "Pesa Status": "category"}
+VILLAGE_DTYPES = {"State Code": "int32", "State Name (In English)": "category", "District Code": "int32",
+                  "District Name (In English)": "category", "Sub-District Code": "int32",
+                  "Sub-District Name (In English)": "category", "Village Code": "int32", "Village Version": "int32",
+                  "Village Name (In English)": "string[pyarrow]", "Village Name (In Local)": "string[pyarrow]",
+                  "Village Status": "category", "Census 2011 Code": "int32"}
+
+
+def file_url(file_name: str, base_url: str = BASE_URL) -> str:
+    """Return the location of one LGD file under ``base_url``."""
+    return base_url + file_name.replace(" ", "%20")
+
+
+def apply_dtypes(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """Cast ``df`` to the table schema in place and return it."""
+    for column, dtype in dtypes.items():
+        if dtype == "category" or dtype.startswith("string"):
+            df[column] = df[column].astype(dtype)
+        else:
+            df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0).astype(dtype)
+    # Any other text column is Arrow-backed too, matching what the cache reads back
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].astype("string[pyarrow]")
+    return df
+
+
+def read_states(source) -> pd.DataFrame:
+    return apply_dtypes(pd.read_csv(source, usecols=STATE_COLUMNS)[STATE_COLUMNS], STATE_DTYPES)
+
+
+def read_districts(source) -> pd.DataFrame:
+    return apply_dtypes(pd.read_csv(source, usecols=DISTRICT_COLUMNS)[DISTRICT_COLUMNS], DISTRICT_DTYPES)
+
+
+def read_sub_districts(source) -> pd.DataFrame:
+    return apply_dtypes(pd.read_csv(source, usecols=SUB_DISTRICT_COLUMNS)[SUB_DISTRICT_COLUMNS],
+                        SUB_DISTRICT_DTYPES)
+
+
+def read_villages(source) -> pd.DataFrame:
+    return apply_dtypes(pd.read_csv(source, usecols=VILLAGE_COLUMNS)[VILLAGE_COLUMNS], VILLAGE_DTYPES)
+
+
+# table name -> (source file, CSV reader)
+TABLES: Dict[str, tuple] = {
+    "states": (STATE_FILE, read_states),
+    "districts": (DISTRICT_FILE, read_districts),
+    "sub_districts": (SUB_DISTRICT_FILE, read_sub_districts),
+    "villages": (VILLAGE_FILE, read_villages),
+}
+
+
+@dataclass(frozen=True)
+class LGDDataset:
+    """The four LGD tables, parsed once and shared by every section and session of the app (read-only)."""
+
+    states: pd.DataFrame
+    districts: pd.DataFrame
+    sub_districts: pd.DataFrame
+    villages: pd.DataFrame
+    # Precomputed KPI counts, State Wise Records and validation report (see derived_metadata)
+    metadata: dict = field(default_factory=dict)
+
+    @property
+    def version(self) -> Optional[str]:
+        """The cache's data version these tables were loaded at (None when loaded without a cache)."""
+        return self.metadata.get("version")
+
+
+def memory_usage(dataset: LGDDataset) -> Dict[str, dict]:
+    """In-memory size of each table, in total and per row (for sizing workers)."""
+    report = {}
+    for name in TABLES:
+        df = getattr(dataset, name)
+        total = int(df.memory_usage(index=False, deep=True).sum())
+        report[name] = {"rows": len(df), "bytes": total, "bytes_per_row": round(total / max(len(df), 1), 1)}
+    return report
+
+
+def derived_metadata(dataset: LGDDataset) -> dict:
+    """Everything computed once per data version: KPIs, State Wise Records, memory use and the validation report."""
+    return dict(summary.dataset_metadata(dataset), memory=memory_usage(dataset),
+                validation=validate.validate(dataset))
+
+
+def load_table(name: str, data_dir: Path = DATA_DIR, cache_dir: Optional[Path] = CACHE_DIR,
+               base_url: str = BASE_URL) -> pd.DataFrame:
+    """Load one table from the local cache, rebuilding it from CSV when missing or stale."""
+    file_name, reader = TABLES[name]
+    return cache.load(name, reader, Path(data_dir) / file_name, file_url(file_name, base_url), cache_dir)
+
+
+def load_metadata(dataset: LGDDataset, cache_dir: Optional[Path] = CACHE_DIR) -> dict:
+    """Derived figures for ``dataset``: read from the cache, or computed (and stored) once per data version."""
+    metadata = cache.read_metadata(Path(cache_dir)) if cache_dir is not None else {}
+    # Caches written before validation existed have no report yet
+    if "validation" not in metadata:
+        metadata = derived_metadata(dataset)
+        if cache_dir is not None:
+            cache.write_metadata(Path(cache_dir), metadata)
+            metadata["version"] = cache.data_version(Path(cache_dir))
+    return metadata
+
+
+def load_dataset(base_url: str = BASE_URL, data_dir: Path = DATA_DIR,
+                 cache_dir: Optional[Path] = CACHE_DIR) -> LGDDataset:
+    """Fetch and parse each LGD file once; the four tables load concurrently.
+
+    Raises :class:`~lgd.validate.DataValidationError` when the data failed validation.
+    """
+    with ThreadPoolExecutor(max_workers=len(TABLES)) as pool:
+        futures = {name: pool.submit(load_table, name, data_dir, cache_dir, base_url) for name in TABLES}
+        dataset = LGDDataset(**{name: future.result() for name, future in futures.items()})
+    metadata = load_metadata(dataset, cache_dir)
+    validate.raise_for_errors(metadata["validation"])
+    return replace(dataset, metadata=metadata)
+
+
+def ingest(data_dir: Path = DATA_DIR, cache_dir: Path = CACHE_DIR, base_url: str = BASE_URL,
+           publish: bool = True) -> dict:
+    """Offline step: parse every CSV in ``data_dir`` (or the remote copy) into a cache and validate it.
+
+    The tables are built in a staging copy of ``cache_dir``, which replaces it
+    only when ``publish`` is set and validation finds no errors. With errors,
+    :class:`~lgd.validate.DataValidationError` is raised (when publishing) and
+    ``cache_dir`` keeps its previous data. Returns the metadata, whose
+    ``validation`` entry is the report.
+    """
+    with cache.staging(Path(cache_dir)) as stage:
+        with ThreadPoolExecutor(max_workers=len(TABLES)) as pool:
+            futures = {name: pool.submit(cache.build, name, reader, Path(data_dir) / file_name,
+                                         file_url(file_name, base_url), stage)
+                       for name, (file_name, reader) in TABLES.items()}
+            dataset = LGDDataset(**{name: future.result() for name, future in futures.items()})
+        metadata = derived_metadata(dataset)
+        cache.write_metadata(stage, metadata)
+        if publish:
+            validate.raise_for_errors(metadata["validation"])
+            cache.publish(stage, Path(cache_dir))
+    return metadata
@@ -0,0 +1,151 @@
+"""Streaming export of hierarchy subsets and search results.
+
+Rows are taken from a table by the row positions an index returns (a
+:class:`lgd.hierarchy.HierarchyIndex` subtree or a search), ``chunksize`` at
+a time, and encoded chunk by chunk as CSV, Parquet or JSON Lines. No filtered
+copy of the table is built, so memory stays bounded by the chunk size
+however large the selection::
+
+    python -m lgd.export --state 9 -o up_villages.parquet
+    python -m lgd.export --district 162 --table sub_districts -o subdistricts.csv
+    python -m lgd.export --search rampur --format jsonl > rampur.jsonl
+"""
+import argparse
+import io
+import sys
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from lgd.hierarchy import LEVELS, HierarchyIndex
+
+# format -> (file extension, MIME type)
+FORMATS = {"csv": (".csv", "text/csv"), "parquet": (".parquet", "application/vnd.apache.parquet"),
+           "jsonl": (".jsonl", "application/x-ndjson")}
+DEFAULT_CHUNKSIZE = 50_000
+
+
+def subtree_positions(hierarchy: HierarchyIndex, level: str, code: int, table: str = "villages") -> np.ndarray:
+    """Row positions in ``table`` of every entity under ``code`` (``code``'s own row when ``table == level``)."""
+    if table == level:
+        position = hierarchy.position(level, code)
+        return np.array([position] if position >= 0 else [], dtype=np.int64)
+    return hierarchy.descendants(level, code, table)
+
+
+class _Drain(io.RawIOBase):
+    # Write-only sink handing back what was written since the last drain(); tell() keeps counting
+    # so the Parquet footer's offsets stay right
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        self._position += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def stream(df: pd.DataFrame, positions: np.ndarray, fmt: str = "csv",
+           chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[bytes]:
+    """Encoded rows ``df.iloc[positions]`` in the given format, one piece per chunk of rows."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    starts = range(0, len(positions), chunksize) if len(positions) else [0]
+    sink, writer = _Drain(), None
+    for start in starts:
+        chunk = df.iloc[positions[start:start + chunksize]]
+        if fmt == "csv":
+            yield chunk.to_csv(index=False, header=start == 0).encode("utf-8")
+        elif fmt == "jsonl":
+            if len(chunk):
+                yield chunk.to_json(orient="records", lines=True, force_ascii=False).encode("utf-8")
+        else:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            writer = writer or pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table)
+            yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def to_bytes(df: pd.DataFrame, positions: np.ndarray, fmt: str = "csv",
+             chunksize: int = DEFAULT_CHUNKSIZE) -> bytes:
+    """The whole :func:`stream`, for consumers that need one buffer (Streamlit's download button)."""
+    return b"".join(stream(df, positions, fmt, chunksize))
+
+
+def write(df: pd.DataFrame, positions: np.ndarray, output, fmt: str = "csv",
+          chunksize: int = DEFAULT_CHUNKSIZE) -> int:
+    """Stream the rows to ``output`` (a path or ``'-'`` for stdout); returns the number of rows written."""
+    out = sys.stdout.buffer if output == "-" else open(output, "wb")
+    try:
+        for piece in stream(df, positions, fmt, chunksize):
+            out.write(piece)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return len(positions)
+
+
+def format_for(output: str, fmt: Optional[str] = None) -> str:
+    """``fmt`` if given, else the format named by ``output``'s extension (CSV by default)."""
+    if fmt:
+        return fmt
+    for name, (extension, _) in FORMATS.items():
+        if str(output).endswith(extension):
+            return name
+    return "csv"
+
+
+def main(argv: Optional[list] = None) -> None:
+    from lgd.data import load_dataset
+    from lgd.search import SEARCH_COLUMNS, SearchIndex
+
+    parser = argparse.ArgumentParser(description="Export LGD rows under a state/district/sub-district or matching a search.")
+    selection = parser.add_mutually_exclusive_group(required=True)
+    selection.add_argument("--state", type=int, metavar="CODE")
+    selection.add_argument("--district", type=int, metavar="CODE")
+    selection.add_argument("--sub-district", type=int, metavar="CODE")
+    selection.add_argument("--search", metavar="TEXT", help="rows whose name or code contains TEXT")
+    parser.add_argument("--table", default="villages", choices=LEVELS, help="table the exported rows come from")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the output extension, else CSV")
+    parser.add_argument("-o", "--output", default="-", help="output file ('-' for stdout)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows encoded per chunk")
+    args = parser.parse_args(argv)
+
+    dataset = load_dataset()
+    df = getattr(dataset, args.table)
+    if args.search is not None:
+        if args.table not in SEARCH_COLUMNS:
+            parser.error(f"--search does not cover {args.table}")
+        positions = SearchIndex(df, SEARCH_COLUMNS[args.table]).search(args.search)
+    else:
+        level, code = next((level, code) for level, code in (("states", args.state), ("districts", args.district),
+                                                             ("sub_districts", args.sub_district))
+                           if code is not None)
+        if LEVELS.index(args.table) < LEVELS.index(level):
+            parser.error(f"--table must be {level} or below")
+        positions = subtree_positions(HierarchyIndex(dataset), level, code, args.table)
+    rows = write(df, positions, args.output, format_for(args.output, args.format), args.chunksize)
+    print(f"exported {rows} {args.table} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
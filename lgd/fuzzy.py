@@ -0,0 +1,200 @@
+"""Fuzzy, transliteration-aware name matching.
+
+Every English and local-language name is reduced to a phonetic *skeleton*:
+Indic scripts are transliterated to Latin (the Unicode Indic blocks share one
+layout, so a single table covers Devanagari, Bengali, Gurmukhi, Gujarati,
+Odia, Tamil, Telugu, Kannada and Malayalam), then case, diacritics,
+aspiration (``dh`` -> ``d``), common spelling variants and doubled letters
+are folded away. "Barddhaman", "Bardhaman" and "বর্ধমান" share one skeleton.
+
+A query is answered by trigram blocking over the distinct skeletons (only
+those sharing the most trigrams with the query are considered) followed by a
+bounded edit distance on that short list, so no per-query work touches all
+~650k village names.
+"""
+import re
+import unicodedata
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lgd.search import TrigramPostings, to_codepoints, trigram_keys
+
+# Name columns matched by fuzzy search, per dataset table
+FUZZY_COLUMNS: Dict[str, List[str]] = {
+    "districts": ["District Name (In English)", "District Name (In Local language)"],
+    "sub_districts": ["Sub-District Name (In English)", "Sub-District Name (In Local language)"],
+    "villages": ["Village Name (In English)", "Village Name (In Local)"],
+}
+# Skeletons sharing the most trigrams with the query that go on to the edit-distance check
+CANDIDATES = 256
+
+# Latin for each offset within a Unicode Indic block (U+0900 Devanagari, U+0980 Bengali, ...)
+_INDIC_START, _INDIC_END = 0x0900, 0x0D7F
+_INDIC_VOWELS = {0x05: "a", 0x06: "aa", 0x07: "i", 0x08: "ii", 0x09: "u", 0x0A: "uu", 0x0B: "ri", 0x0C: "li",
+                 0x0D: "e", 0x0E: "e", 0x0F: "e", 0x10: "ai", 0x11: "o", 0x12: "o", 0x13: "o", 0x14: "au",
+                 0x60: "ri", 0x61: "li"}
+_INDIC_CONSONANTS = {0x15: "k", 0x16: "kh", 0x17: "g", 0x18: "gh", 0x19: "n", 0x1A: "ch", 0x1B: "chh", 0x1C: "j",
+                     0x1D: "jh", 0x1E: "n", 0x1F: "t", 0x20: "th", 0x21: "d", 0x22: "dh", 0x23: "n", 0x24: "t",
+                     0x25: "th", 0x26: "d", 0x27: "dh", 0x28: "n", 0x29: "n", 0x2A: "p", 0x2B: "ph", 0x2C: "b",
+                     0x2D: "bh", 0x2E: "m", 0x2F: "y", 0x30: "r", 0x31: "r", 0x32: "l", 0x33: "l", 0x34: "l",
+                     0x35: "v", 0x36: "sh", 0x37: "sh", 0x38: "s", 0x39: "h", 0x58: "k", 0x59: "kh", 0x5A: "g",
+                     0x5B: "z", 0x5C: "r", 0x5D: "rh", 0x5E: "f", 0x5F: "y", 0x71: "v"}
+_INDIC_SIGNS = {0x3E: "aa", 0x3F: "i", 0x40: "ii", 0x41: "u", 0x42: "uu", 0x43: "ri", 0x44: "ri", 0x45: "e",
+                0x46: "e", 0x47: "e", 0x48: "ai", 0x49: "o", 0x4A: "o", 0x4B: "o", 0x4C: "au", 0x62: "li",
+                0x63: "li", 0x01: "n", 0x02: "n", 0x03: "h"}
+_VIRAMA, _NUKTA = 0x4D, 0x3C
+
+
+def _indic_table() -> dict:
+    # Consonants carry an inherent-vowel marker "A"; vowel signs and the virama start with
+    # "\x01", which cancels a preceding marker (see transliterate)
+    table = {}
+    for block in range(_INDIC_START, _INDIC_END, 0x80):
+        table.update({block + offset: latin for offset, latin in _INDIC_VOWELS.items()})
+        table.update({block + offset: latin + "A" for offset, latin in _INDIC_CONSONANTS.items()})
+        table.update({block + offset: ("\x01" if offset >= 0x3E else "") + latin
+                      for offset, latin in _INDIC_SIGNS.items()})
+        table.update({block + 0x66 + digit: str(digit) for digit in range(10)})
+        table.update({block + _VIRAMA: "\x01", block + _NUKTA: ""})
+    return table
+
+
+_INDIC = str.maketrans(_indic_table())
+# The inherent vowel of a word-final consonant is silent
+_FINAL_INHERENT = re.compile(r"A(?![a-z])")
+
+# Spelling variants folded together after transliteration
+_LETTER_FOLDS = str.maketrans({"w": "v", "z": "j", "q": "k"})
+_ASPIRATED = ["bh", "ch", "dh", "gh", "jh", "kh", "ph", "sh", "th"]
+# Spaces and punctuation are dropped too: "Bara Banki" and "Barabanki" are the same name
+_NOT_ALNUM = re.compile(r"[^a-z0-9\n]+")
+# Posting lists are read shortest first until about this many ids, so very common
+# trigrams ("vil", "pur") neither dominate the ranking nor cost a pass over every name
+POSTINGS_BUDGET = 100_000
+
+
+def transliterate(text: str) -> str:
+    """Rough Latin rendering of Indic-script text (expects lower-case); other characters pass through."""
+    text = text.translate(_INDIC).replace("A\x01", "").replace("\x01", "")
+    return _FINAL_INHERENT.sub("", text).replace("A", "a")
+
+
+def skeletons(names) -> np.ndarray:
+    """Phonetic keys used for fuzzy matching (see module docstring), one per name.
+
+    All names are processed as one newline-joined string, so every step runs
+    once at C speed instead of once per name.
+    """
+    text = "\n".join(str(name).replace("\n", " ") for name in names)
+    text = unicodedata.normalize("NFKD", transliterate(text.lower()))
+    text = _NOT_ALNUM.sub("", text).translate(_LETTER_FOLDS)
+    for pair in _ASPIRATED:
+        text = text.replace(pair, pair[0])
+    text = text.replace("ee", "i").replace("oo", "u")
+
+    # Collapse doubled letters (not digits, nor the newlines between names)
+    codepoints = to_codepoints(text)
+    keep = np.ones(len(codepoints), dtype=bool)
+    keep[1:] = (codepoints[1:] != codepoints[:-1]) | (codepoints[1:] < ord("a"))
+    text = codepoints[keep].tobytes().decode("utf-32-le")
+    return np.array(text.split("\n"), dtype=object)
+
+
+def skeleton(name: str) -> str:
+    return skeletons([name])[0]
+
+
+def bounded_levenshtein(a: str, b: str, bound: int) -> int:
+    """Edit distance between ``a`` and ``b``, or ``bound + 1`` as soon as it must exceed ``bound``."""
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return previous[-1]
+
+
+def _padded(key: str) -> str:
+    # Anchors let one- and two-letter skeletons still produce trigrams
+    return f"^{key}$"
+
+
+class FuzzyIndex:
+    """Top-k fuzzy name lookup over the name columns of one table."""
+
+    def __init__(self, df: pd.DataFrame, columns: List[str]):
+        rows, keys = [], []
+        for column in columns:
+            codes, uniques = pd.factorize(df[column])
+            valid = codes >= 0
+            rows.append(np.flatnonzero(valid))
+            keys.append(skeletons(uniques)[codes[valid]])
+        rows, keys = np.concatenate(rows), np.concatenate(keys)
+
+        # Distinct skeleton -> rows (CSR), over non-empty skeletons only
+        key_ids, self.keys = pd.factorize(keys)
+        self.keys = np.asarray(self.keys, dtype=object)
+        order = np.argsort(key_ids, kind="stable")
+        self._rows = rows[order]
+        self._offsets = np.zeros(len(self.keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(key_ids, minlength=len(self.keys)), out=self._offsets[1:])
+
+        self._lengths = np.fromiter(map(len, self.keys), dtype=np.int64, count=len(self.keys))
+        self._trigrams = TrigramPostings(to_codepoints("".join(_padded(key) + "\x00" for key in self.keys)))
+
+    def _candidates(self, key: str, bound: int) -> np.ndarray:
+        trigrams = np.unique(trigram_keys(to_codepoints(_padded(key))))
+        postings = sorted((self._trigrams.get(trigram) for trigram in trigrams), key=len)
+        selected, total = [], 0
+        for posting in postings:
+            if selected and total + len(posting) > POSTINGS_BUDGET:
+                break
+            selected.append(posting)
+            total += len(posting)
+        shared = np.bincount(np.concatenate(selected), minlength=len(self.keys))
+        ids = np.flatnonzero(shared)
+        shared = shared[ids]
+        close = np.abs(self._lengths[ids] - len(key)) <= bound
+        ids, shared = ids[close], shared[close]
+        if len(ids) > CANDIDATES:
+            keep = np.argpartition(-shared, CANDIDATES)[:CANDIDATES]
+            ids = ids[keep]
+        return ids
+
+    def search(self, query: str, k: int = 20, max_distance: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Row positions of the ``k`` closest names and their edit distance, best first.
+
+        ``max_distance`` defaults to a quarter of the query's skeleton length (at least 1).
+        """
+        key = skeleton(query)
+        if not key:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        bound = max(1, len(key) // 4) if max_distance is None else max_distance
+
+        scored = []
+        for key_id in self._candidates(key, bound):
+            distance = bounded_levenshtein(key, self.keys[key_id], bound)
+            if distance <= bound:
+                scored.append((distance, int(key_id)))
+        scored.sort()
+
+        best: Dict[int, int] = {}
+        for distance, key_id in scored:
+            for row in self._rows[self._offsets[key_id]:self._offsets[key_id + 1]]:
+                best.setdefault(int(row), distance)
+            if len(best) >= k:
+                break
+        positions = np.fromiter(best, dtype=np.int64, count=len(best))[:k]
+        distances = np.fromiter(best.values(), dtype=np.int64, count=len(best))[:k]
+        return positions, distances
+
+
+def build_fuzzy_index(dataset, table: str) -> FuzzyIndex:
+    return FuzzyIndex(getattr(dataset, table), FUZZY_COLUMNS[table])
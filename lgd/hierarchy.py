@@ -0,0 +1,187 @@
+"""LGD code hierarchy: state -> district -> sub-district -> village.
+
+:class:`HierarchyIndex` turns the four loaded tables into dense code -> position
+arrays and CSR-style adjacency (children of every node, in every descendant
+level), so parent lookups, child enumeration and subtree counts are O(1) and
+never rescan the village table.
+
+Parent links come from the numeric codes carried by the village table. The
+district and sub-district files only describe their parents in the free-text
+``Hierarchy`` column, so that column is consulted (once per distinct label)
+only for entities that have no villages to take the codes from.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+LEVELS = ("states", "districts", "sub_districts", "villages")
+CODE_COLUMNS = {"states": "State LGD Code", "districts": "District LGD Code",
+                "sub_districts": "Sub-District LGD Code", "villages": "Village Code"}
+NAME_COLUMNS = {"states": "State Name (In English)", "districts": "District Name (In English)",
+                "sub_districts": "Sub-District Name (In English)", "villages": "Village Name (In English)"}
+# Village table columns holding each ancestor's code
+VILLAGE_PARENT_COLUMNS = {"states": "State Code", "districts": "District Code", "sub_districts": "Sub-District Code"}
+
+
+def label_names(labels: pd.Series, kind: str) -> pd.Series:
+    """The ``<name>(<kind>)`` part of labels such as ``"Kaimur (Bhabua)(District) / Bihar(State)"``."""
+    suffix = f"({kind})"
+    parts = labels.astype(str).str.split(" / ").explode()
+    parts = parts[parts.str.endswith(suffix)].str.slice(stop=-len(suffix)).str.strip()
+    return parts[~parts.index.duplicated()].reindex(labels.index)
+
+
+def _unique_lookup(keys, codes) -> Dict:
+    """key -> code, leaving out keys that name more than one code."""
+    lookup = pd.Series(np.asarray(codes), index=pd.Index(list(keys), tupleize_cols=False))
+    return lookup[~lookup.index.duplicated(keep=False)].to_dict()
+
+
+def _village_parents(villages: pd.DataFrame, child: str, parent: str) -> pd.Series:
+    pairs = villages[[child, parent]]
+    pairs = pairs[pairs[child] != 0].drop_duplicates(child)
+    return pd.Series(pairs[parent].to_numpy(), index=pairs[child].to_numpy())
+
+
+def parent_links(dataset) -> Tuple[pd.Series, pd.Series]:
+    """District -> state code and sub-district -> district code (0 when unknown),
+    as Series indexed by the child code."""
+    states, districts, sub_districts = dataset.states, dataset.districts, dataset.sub_districts
+    district_codes = districts[CODE_COLUMNS["districts"]].to_numpy()
+    sub_district_codes = sub_districts[CODE_COLUMNS["sub_districts"]].to_numpy()
+
+    district_state = _village_parents(dataset.villages, "District Code", "State Code").reindex(district_codes)
+    sub_district_district = _village_parents(dataset.villages, "Sub-District Code",
+                                             "District Code").reindex(sub_district_codes)
+
+    # Entities without villages: fall back to their Hierarchy label, resolved once per distinct label
+    state_by_name = _unique_lookup(states[NAME_COLUMNS["states"]].astype(str), states[CODE_COLUMNS["states"]])
+    missing = district_state.isna().to_numpy()
+    if missing.any():
+        labels = pd.Series(districts["Hierarchy"].to_numpy()[missing]).drop_duplicates()
+        resolved = dict(zip(labels, label_names(labels, "State").map(state_by_name)))
+        district_state[missing] = [resolved.get(label) for label in districts["Hierarchy"].to_numpy()[missing]]
+
+    missing = sub_district_district.isna().to_numpy()
+    if missing.any():
+        state_names = {code: name for name, code in state_by_name.items()}
+        district_by_name = _unique_lookup(
+            zip(district_state.map(state_names), districts[NAME_COLUMNS["districts"]].astype(str)), district_codes)
+        labels = pd.Series(sub_districts["Hierarchy"].to_numpy()[missing]).drop_duplicates()
+        keys = zip(label_names(labels, "State"), label_names(labels, "District"))
+        resolved = dict(zip(labels, [district_by_name.get(key) for key in keys]))
+        sub_district_district[missing] = [resolved.get(label)
+                                          for label in sub_districts["Hierarchy"].to_numpy()[missing]]
+
+    return district_state.fillna(0).astype("int64"), sub_district_district.fillna(0).astype("int64")
+
+
+def _positions(codes: np.ndarray) -> np.ndarray:
+    """Dense code -> position array (-1 for unknown codes)."""
+    lookup = np.full(int(codes.max(initial=0)) + 1, -1, dtype=np.int32)
+    lookup[codes] = np.arange(len(codes), dtype=np.int32)
+    return lookup
+
+
+class HierarchyIndex:
+    """Parent/child/subtree lookups keyed by LGD code.
+
+    For every pair of levels (ancestor, descendant) the descendants are sorted
+    by their ancestor, so each ancestor owns one contiguous ``[start, end)``
+    slice: its children (or village rows) are that slice and its subtree
+    count is ``end - start``.
+    """
+
+    def __init__(self, dataset):
+        district_state, sub_district_district = parent_links(dataset)
+        villages = dataset.villages
+
+        self.codes = {level: getattr(dataset, level)[CODE_COLUMNS[level]].to_numpy().astype(np.int64)
+                      for level in LEVELS}
+        self.names = {level: getattr(dataset, level)[NAME_COLUMNS[level]].astype(str).to_numpy()
+                      for level in LEVELS}
+        self._position = {level: _positions(codes) for level, codes in self.codes.items()}
+
+        # ancestor[level][ancestor_level] = position of each entity's ancestor (-1 when unknown)
+        self._ancestor: Dict[str, Dict[str, np.ndarray]] = {level: {} for level in LEVELS}
+        self._ancestor["districts"]["states"] = self.positions("states", district_state.to_numpy())
+        self._ancestor["sub_districts"]["districts"] = self.positions("districts", sub_district_district.to_numpy())
+        self._ancestor["sub_districts"]["states"] = self._through(self._ancestor["sub_districts"]["districts"],
+                                                                  self._ancestor["districts"]["states"])
+        for ancestor, column in VILLAGE_PARENT_COLUMNS.items():
+            self._ancestor["villages"][ancestor] = self.positions(ancestor, villages[column].to_numpy())
+
+        # CSR per (descendant level, ancestor level): descendants ordered by ancestor + offsets
+        self._order: Dict[Tuple[str, str], np.ndarray] = {}
+        self._offsets: Dict[Tuple[str, str], np.ndarray] = {}
+        for level, ancestors in self._ancestor.items():
+            for ancestor, positions in ancestors.items():
+                order = np.argsort(positions, kind="stable")
+                self._order[level, ancestor] = order.astype(np.int32)
+                self._offsets[level, ancestor] = np.searchsorted(
+                    positions[order], np.arange(len(self.codes[ancestor]) + 1))
+
+    @staticmethod
+    def _through(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+        return np.where(first >= 0, second[np.maximum(first, 0)], -1) if len(second) else first
+
+    def positions(self, level: str, codes) -> np.ndarray:
+        """Row positions in ``level``'s table for an array of codes (-1 where unknown)."""
+        codes = np.asarray(codes, dtype=np.int64)
+        lookup = self._position[level]
+        known = (codes >= 0) & (codes < len(lookup))
+        return np.where(known, lookup[np.where(known, codes, 0)], -1)
+
+    def position(self, level: str, code: int) -> int:
+        """Row position of one code (-1 where unknown, including codes too large for an int64)."""
+        if not 0 <= code < len(self._position[level]):
+            return -1
+        return int(self._position[level][code])
+
+    def name(self, level: str, code: int) -> Optional[str]:
+        pos = self.position(level, code)
+        return None if pos < 0 else self.names[level][pos]
+
+    def parent(self, level: str, code: int, ancestor: Optional[str] = None) -> Optional[int]:
+        """Code of the parent (or of ``ancestor``) of ``code``; ``None`` when unknown."""
+        ancestor = ancestor or LEVELS[LEVELS.index(level) - 1]
+        pos = self.position(level, code)
+        if pos < 0:
+            return None
+        parent = self._ancestor[level][ancestor][pos]
+        return None if parent < 0 else int(self.codes[ancestor][parent])
+
+    def ancestor_positions(self, level: str, positions: np.ndarray, ancestor: str) -> np.ndarray:
+        """Vectorized :meth:`parent`: positions of the ``ancestor`` of each ``level`` position (-1 if unknown)."""
+        positions = np.asarray(positions)
+        parents = self._ancestor[level][ancestor]
+        return np.where(positions >= 0, parents[np.maximum(positions, 0)], -1) if len(parents) else positions
+
+    def _slice(self, level: str, code: int, descendant: str) -> np.ndarray:
+        pos = self.position(level, code)
+        if pos < 0:
+            return np.empty(0, dtype=np.int32)
+        offsets = self._offsets[descendant, level]
+        return self._order[descendant, level][offsets[pos]:offsets[pos + 1]]
+
+    def descendants(self, level: str, code: int, descendant: Optional[str] = None) -> np.ndarray:
+        """Row positions (in ``descendant``'s table, default: direct children) under ``code``."""
+        return self._slice(level, code, descendant or LEVELS[LEVELS.index(level) + 1])
+
+    def children(self, level: str, code: int) -> np.ndarray:
+        """Codes of the direct children of ``code``."""
+        child = LEVELS[LEVELS.index(level) + 1]
+        return self.codes[child][self._slice(level, code, child)]
+
+    def count(self, level: str, code: int, descendant: str) -> int:
+        """Number of ``descendant`` entities under ``code``."""
+        pos = self.position(level, code)
+        if pos < 0:
+            return 0
+        offsets = self._offsets[descendant, level]
+        return int(offsets[pos + 1] - offsets[pos])
+
+    def counts(self, level: str, descendant: str) -> np.ndarray:
+        """Subtree counts for every entity of ``level``, aligned with its table."""
+        return np.diff(self._offsets[descendant, level])
@@ -0,0 +1,59 @@
+"""Chunked CSV/Parquet reading and writing shared by the bulk command-line tools."""
+import sys
+from collections import defaultdict
+from typing import Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def is_parquet(path) -> bool:
+    return isinstance(path, str) and path.endswith(".parquet")
+
+
+def read_chunks(source, chunksize: int, dtype: Optional[dict] = None) -> Iterator[pd.DataFrame]:
+    """Yield ``source`` (a CSV, a ``.parquet`` file or ``'-'`` for CSV on stdin) ``chunksize`` rows at a time.
+
+    CSV columns not named in ``dtype`` are read as text: types inferred per
+    chunk would differ between chunks (a column empty in one chunk is float there).
+    """
+    if is_parquet(source):
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(sys.stdin if source == "-" else source, chunksize=chunksize,
+                               dtype=defaultdict(lambda: "string", dtype or {}))
+
+
+class ChunkWriter:
+    """Appends DataFrame chunks to a CSV, a ``.parquet`` file or ``'-'`` (CSV on stdout)."""
+
+    def __init__(self, output):
+        self.output = sys.stdout if output == "-" else output
+        self.rows = 0
+        self._parquet: Optional[pq.ParquetWriter] = None
+        self._schema: Optional[pa.Schema] = None
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if is_parquet(self.output):
+            if self._parquet is None:
+                # The file's schema comes from the first chunk; columns with no values there are taken as text
+                schema = pa.Table.from_pandas(chunk, preserve_index=False).schema
+                self._schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                          for field in schema], metadata=schema.metadata)
+                self._parquet = pq.ParquetWriter(self.output, self._schema)
+            self._parquet.write_table(pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False))
+        else:
+            chunk.to_csv(self.output, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        self.rows += len(chunk)
+
+    def close(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+
+    def __enter__(self) -> "ChunkWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,154 @@
+"""Load test for the lookup service (:mod:`lgd.service`).
+
+Discovers real codes and names through the API, then replays a mix of code
+lookups, children listings, searches and conversions over ``--concurrency``
+keep-alive connections and prints throughput and latency percentiles as JSON::
+
+    python -m lgd.service --port 8000 &
+    python -m lgd.loadtest http://127.0.0.1:8000 --concurrency 64 --requests 20000
+
+``--revalidate`` sends the ETag of the previous response for the same URL, as
+a caching client would, so repeat requests are answered with 304.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+from lgd.bench import percentiles
+from lgd.units import UNITS
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_REQUESTS = 10_000
+# Share of each request kind in the replayed mix
+MIX = {"lookup": 0.5, "children": 0.2, "search": 0.2, "convert": 0.1}
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection issuing GET requests in turn."""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self.opened = 0
+
+    async def get(self, path: str, headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self.opened += 1
+        lines = [f"GET {path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        head = (await self._reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        status = int(head[0].split(" ", 2)[1])
+        response_headers = {}
+        for line in head[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+        body = await self._reader.readexactly(int(response_headers.get("content-length", 0)))
+        if response_headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, response_headers, body
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+async def discover(connection: Connection, seed: int = 0, samples: int = 200) -> Dict[str, List[str]]:
+    """Request paths for each kind in :data:`MIX`, built from codes and names the service returns."""
+    rng = random.Random(seed)
+
+    async def items(path):
+        status, _, body = await connection.get(path)
+        if status != 200:
+            raise RuntimeError(f"GET {path} returned {status}")
+        return json.loads(body)["items"]
+
+    states = await items("/v1/states")
+    villages, paths = [], {kind: [] for kind in MIX}
+    for state in rng.sample(states, min(len(states), 10)):
+        paths["children"].append(f"/v1/states/{state['code']}/children")
+        for district in (await items(f"/v1/states/{state['code']}/children"))[:3]:
+            paths["children"].append(f"/v1/districts/{district['code']}/children?level=villages&limit=50")
+            villages += await items(f"/v1/districts/{district['code']}/children?level=villages&limit=100")
+    for village in rng.sample(villages, min(len(villages), samples)):
+        paths["lookup"].append(f"/v1/villages/{village['code']}")
+        name = village["name"].strip()
+        if len(name) >= 3:
+            paths["search"].append(f"/v1/search?table=villages&limit=20&q={quote(name[:rng.randint(3, len(name))])}")
+    units = list(UNITS)
+    paths["convert"] = [f"/v1/convert?value={rng.randint(1, 1000)}&from={quote(rng.choice(units))}"
+                        f"&to={quote(rng.choice(units))}" for _ in range(samples)]
+    return {kind: kind_paths for kind, kind_paths in paths.items() if kind_paths}
+
+
+async def run(url: str, concurrency: int = DEFAULT_CONCURRENCY, requests: int = DEFAULT_REQUESTS,
+              seed: int = 0, revalidate: bool = False) -> dict:
+    parts = urlsplit(url)
+    host, port = parts.hostname or "127.0.0.1", parts.port or 80
+    setup = Connection(host, port)
+    paths = await discover(setup, seed)
+    setup.close()
+
+    rng = random.Random(seed)
+    kinds = list(paths)
+    schedule = [(kind, rng.choice(paths[kind]))
+                for kind in rng.choices(kinds, weights=[MIX[kind] for kind in kinds], k=requests)]
+    times: Dict[str, List[float]] = {kind: [] for kind in kinds}
+    statuses: Dict[int, int] = {}
+    etags: Dict[str, str] = {}
+    connections = [Connection(host, port) for _ in range(concurrency)]
+    remaining = iter(schedule)
+
+    async def worker(connection: Connection):
+        for kind, path in remaining:
+            headers = {"If-None-Match": etags[path]} if revalidate and path in etags else None
+            start = time.perf_counter()
+            status, response_headers, _ = await connection.get(path, headers)
+            times[kind].append((time.perf_counter() - start) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+            if "etag" in response_headers:
+                etags[path] = response_headers["etag"]
+        connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(connection) for connection in connections))
+    seconds = time.perf_counter() - start
+    every = [ms for kind_times in times.values() for ms in kind_times]
+    return {"url": url, "concurrency": concurrency, "requests": len(every), "seconds": round(seconds, 3),
+            "requests_per_second": round(len(every) / seconds, 1),
+            "connections_opened": sum(connection.opened for connection in connections),
+            "statuses": {str(status): n for status, n in sorted(statuses.items())},
+            "latency": percentiles(every),
+            "by_kind": {kind: percentiles(kind_times) for kind, kind_times in times.items() if kind_times}}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Measure the lookup service's latency under concurrent load.")
+    parser.add_argument("url", nargs="?", default="http://127.0.0.1:8000", help="service base URL")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[DEFAULT_CONCURRENCY],
+                        help="concurrent connections; several values run one after another")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="requests per run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--revalidate", action="store_true", help="send If-None-Match with known ETags")
+    parser.add_argument("-o", "--output", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = [asyncio.run(run(args.url, concurrency, args.requests, args.seed, args.revalidate))
+               for concurrency in args.concurrency]
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Optional timing, memory and cache instrumentation for the app's hot paths.
+
+Collection is off unless ``LGD_METRICS=1`` is set when the app starts; while
+off, :func:`stage` returns a shared no-op context manager and :func:`cached`
+returns the plain Streamlit-cached function, so the instrumented code paths
+cost one function call each.
+
+When on, every stage (download, parse, cache read, search, render, ...)
+records its call count, total and worst wall time and the change in resident
+memory, each completed stage is logged as one JSON line on the
+``lgd.metrics`` logger, and the totals are available as Prometheus text
+(:func:`prometheus_text`), optionally written to ``LGD_METRICS_FILE`` for a
+node_exporter textfile collector.
+"""
+import functools
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ENABLED = os.environ.get("LGD_METRICS", "").lower() in ("1", "true", "yes")
+METRICS_FILE = os.environ.get("LGD_METRICS_FILE")
+
+logger = logging.getLogger("lgd.metrics")
+
+_NOOP = nullcontext()
+_lock = threading.Lock()
+# (stage, labels) -> [calls, total seconds, max seconds, last RSS change in bytes]
+_stages: Dict[Tuple[str, tuple], list] = {}
+# (counter, labels) -> value
+_counters: Dict[Tuple[str, tuple], int] = {}
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident memory of this process, or None where ``/proc`` is unavailable."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * mmap.PAGESIZE
+    except OSError:
+        return None
+
+
+@contextmanager
+def _timed(name: str, labels: dict):
+    rss_before = rss_bytes() or 0
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        rss_delta = (rss_bytes() or 0) - rss_before
+        key = (name, tuple(sorted(labels.items())))
+        with _lock:
+            entry = _stages.setdefault(key, [0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3] = rss_delta
+        logger.info(json.dumps({"stage": name, **labels, "seconds": round(seconds, 6), "rss_delta": rss_delta}))
+
+
+def stage(name: str, **labels):
+    """Context manager timing one stage; ``labels`` (e.g. ``table="villages"``) split its figures."""
+    if not ENABLED:
+        return _NOOP
+    return _timed(name, labels)
+
+
+def count(name: str, amount: int = 1, **labels) -> None:
+    """Add ``amount`` to a counter."""
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def cached(cache_decorator):
+    """Apply a Streamlit cache decorator (``st.cache_data``/``st.cache_resource``, configured or not)
+    and count calls and misses of the result; the function body only runs on a miss."""
+    def decorate(func):
+        if not ENABLED:
+            return cache_decorator(func)
+
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            count("cache_misses_total", cache=func.__name__)
+            with stage("cache_fill", cache=func.__name__):
+                return func(*args, **kwargs)
+
+        cached_func = cache_decorator(compute)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            count("cache_calls_total", cache=func.__name__)
+            return cached_func(*args, **kwargs)
+
+        call.clear = cached_func.clear
+        return call
+    return decorate
+
+
+def stage_rows() -> List[dict]:
+    """One row per recorded stage, for display."""
+    with _lock:
+        items = sorted(_stages.items())
+    return [{"stage": name, "labels": ", ".join(f"{k}={v}" for k, v in labels), "calls": calls,
+             "mean ms": round(total / calls * 1000, 3), "max ms": round(worst * 1000, 3),
+             "last RSS change MiB": round(rss_delta / 2 ** 20, 2)}
+            for (name, labels), (calls, total, worst, rss_delta) in items]
+
+
+def cache_rows() -> List[dict]:
+    """Calls, misses, hits and hit rate per instrumented cache."""
+    with _lock:
+        counters = dict(_counters)
+    rows = []
+    for (name, labels), calls in sorted(counters.items()):
+        if name != "cache_calls_total":
+            continue
+        misses = counters.get(("cache_misses_total", labels), 0)
+        rows.append({"cache": dict(labels)["cache"], "calls": calls, "misses": misses, "hits": calls - misses,
+                     "hit rate": round((calls - misses) / calls, 3)})
+    return rows
+
+
+def _label_text(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def prometheus_text() -> str:
+    """Everything recorded so far in the Prometheus text exposition format."""
+    with _lock:
+        stages, counters = sorted(_stages.items()), sorted(_counters.items())
+    lines = ["# TYPE lgd_stage_seconds summary"]
+    for (name, labels), (calls, total, _, _) in stages:
+        label_text = _label_text((("stage", name),) + labels)
+        lines += [f"lgd_stage_seconds_count{label_text} {calls}", f"lgd_stage_seconds_sum{label_text} {total:.6f}"]
+    lines.append("# TYPE lgd_stage_seconds_max gauge")
+    lines += [f"lgd_stage_seconds_max{_label_text((('stage', name),) + labels)} {worst:.6f}"
+              for (name, labels), (_, _, worst, _) in stages]
+    lines.append("# TYPE lgd_stage_rss_delta_bytes gauge")
+    lines += [f"lgd_stage_rss_delta_bytes{_label_text((('stage', name),) + labels)} {rss_delta}"
+              for (name, labels), (_, _, _, rss_delta) in stages]
+    for counter in sorted({name for (name, _), _ in counters}):
+        lines.append(f"# TYPE lgd_{counter} counter")
+        lines += [f"lgd_{name}{_label_text(labels)} {value}" for (name, labels), value in counters if name == counter]
+    if rss_bytes() is not None:
+        lines += ["# TYPE lgd_process_resident_memory_bytes gauge", f"lgd_process_resident_memory_bytes {rss_bytes()}"]
+    return "\n".join(lines) + "\n"
+
+
+def export(path: Optional[str] = METRICS_FILE) -> None:
+    """Write :func:`prometheus_text` to ``path`` atomically (no-op when disabled or no path is set)."""
+    if not ENABLED or not path:
+        return
+    path = Path(path)
+    tmp = path.with_suffix(".tmp")
+    try:
+        tmp.write_text(prometheus_text())
+        os.replace(tmp, path)
+    except OSError:
+        logger.warning("could not write metrics to %s", path)
+
+
+def reset() -> None:
+    with _lock:
+        _stages.clear()
+        _counters.clear()
@@ -0,0 +1,201 @@
+"""Incremental refresh of the local dataset cache from a new LGD snapshot.
+
+Tables whose source is unchanged (same checksum or ETag) are skipped
+without being parsed. Each changed table is diffed against the cached copy
+by LGD code into added, removed and changed entities (any field differs,
+whether or not ``Village Version`` was bumped). Only those are applied: cached rows keep their order,
+changed rows are replaced where they stand and new rows are appended. The
+stored KPIs and State Wise Records are then adjusted by the village delta
+instead of being recounted, and the data is validated again
+(:mod:`lgd.validate`). All of it happens in a staging copy of the cache
+that replaces the live one only when validation finds no errors. A
+running app picks up the new data version on its next rerun and builds its
+search indexes for it from the previous ones (:meth:`lgd.search.SearchCache.updated`).
+
+Run it after dropping the new CSVs into the data directory::
+
+    python -m lgd.refresh --data-dir Data --cache-dir .lgd_cache
+"""
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from lgd import cache, data, summary, validate
+from lgd.hierarchy import CODE_COLUMNS
+
+
+@dataclass(frozen=True)
+class Changes:
+    """LGD codes added, removed and changed between two versions of one table."""
+
+    added: np.ndarray
+    removed: np.ndarray
+    changed: np.ndarray
+
+    def __bool__(self) -> bool:
+        return bool(len(self.added) or len(self.removed) or len(self.changed))
+
+    def __str__(self) -> str:
+        return f"{len(self.added)} added, {len(self.removed)} removed, {len(self.changed)} changed"
+
+
+def _values(column: pd.Series) -> np.ndarray:
+    # Numeric columns compare as they are; text and categoricals as objects with None for missing
+    if pd.api.types.is_numeric_dtype(column.dtype) and not isinstance(column.dtype, pd.CategoricalDtype):
+        return column.to_numpy()
+    return column.to_numpy(dtype=object, na_value=None)
+
+
+def diff(old: pd.DataFrame, new: pd.DataFrame, code_column: str) -> Changes:
+    """Compare two versions of a table by LGD code; an entity has changed when any of its fields has.
+
+    Every column is compared, not just ``Village Version``: LGD releases do
+    not always bump the version for a rename or a move.
+    """
+    old_codes, new_codes = old[code_column].to_numpy(), new[code_column].to_numpy()
+    if not (pd.Index(old_codes).is_unique and pd.Index(new_codes).is_unique):
+        raise ValueError(f"duplicate values in {code_column!r}; cannot diff by code")
+    position = pd.Index(old_codes).get_indexer(new_codes)
+    matched = position >= 0
+
+    differs = np.zeros(int(matched.sum()), dtype=bool)
+    for column in new.columns:
+        differs |= _values(old[column])[position[matched]] != _values(new[column])[matched]
+    return Changes(added=new_codes[~matched], removed=old_codes[~pd.Index(old_codes).isin(new_codes)],
+                   changed=new_codes[matched][differs])
+
+
+def _decoded(table: pa.Table) -> pa.Table:
+    # Dictionary (categorical) columns of two tables rarely share a dictionary, so merge plain values
+    columns = [column.cast(column.type.value_type) if pa.types.is_dictionary(column.type) else column
+               for column in table.columns]
+    return pa.table(columns, names=table.column_names)
+
+
+def apply(old: pa.Table, new: pa.Table, code_column: str, changes: Changes) -> pa.Table:
+    """``old`` with ``changes`` taken from ``new``: rows keep their order, new rows go last."""
+    old_codes = old.column(code_column).to_numpy()
+    new_index = pd.Index(new.column(code_column).to_numpy())
+
+    take = np.flatnonzero(~np.isin(old_codes, changes.removed))
+    changed = np.isin(old_codes[take], changes.changed)
+    # Positions >= len(old) select from ``new`` in the concatenated table
+    take[changed] = len(old) + new_index.get_indexer(old_codes[take][changed])
+    take = np.concatenate([take, len(old) + new_index.get_indexer(changes.added)])
+
+    merged = pa.concat_tables([_decoded(old), _decoded(new.select(old.column_names))]).take(take)
+    columns = [pc.dictionary_encode(merged.column(i)) if pa.types.is_dictionary(field.type) else merged.column(i)
+               for i, field in enumerate(old.schema)]
+    return pa.table(columns, names=old.column_names)
+
+
+def refresh(data_dir: Path = data.DATA_DIR, cache_dir: Path = data.CACHE_DIR,
+            base_url: str = data.BASE_URL) -> Dict[str, Changes]:
+    """Bring ``cache_dir`` up to date with the sources, applying only what changed; returns the changes per table.
+
+    The update is built and validated in a staging copy of the cache, which
+    only replaces ``cache_dir`` when it has no errors. Otherwise
+    :class:`~lgd.validate.DataValidationError` is raised and ``cache_dir``
+    keeps serving the previous data.
+    """
+    cache_dir = Path(cache_dir)
+    with cache.staging(cache_dir) as stage:
+        changes, metadata = _apply_sources(Path(data_dir), stage, base_url)
+        validate.raise_for_errors(metadata["validation"])
+        cache.publish(stage, cache_dir)
+    return changes
+
+
+def _apply_sources(data_dir: Path, cache_dir: Path, base_url: str):
+    # Applies the source changes to ``cache_dir`` (the staging copy); returns the changes and the new metadata
+    manifest = cache.read_manifest(cache_dir)
+    metadata = cache.read_metadata(cache_dir)
+    changes: Dict[str, Changes] = {}
+    village_rows = None
+
+    for name, (file_name, reader) in data.TABLES.items():
+        entry, path = manifest.get(name), cache.table_path(cache_dir, name)
+        local_path, url = Path(data_dir) / file_name, data.file_url(file_name, base_url)
+        cached = bool(entry) and path.is_file() and entry.get("schema") == cache.SCHEMA_VERSION
+        if cached and cache.is_fresh(entry, local_path, url):
+            continue
+
+        new_df, checksum, etag = cache.parse_source(name, reader, local_path, url)
+        new_table = pa.Table.from_pandas(new_df, preserve_index=False).replace_schema_metadata(None)
+        code_column = CODE_COLUMNS[name]
+        if not cached:
+            # Nothing to diff against: store the whole table
+            cache.store(name, new_table, cache_dir, checksum, etag)
+            changes[name] = Changes(new_df[code_column].to_numpy(), np.empty(0, np.int32), np.empty(0, np.int32))
+            continue
+
+        old_df = cache.read_table(path)
+        try:
+            table_changes = diff(old_df, new_df, code_column)
+        except ValueError:
+            # Codes are not unique, so entities cannot be matched: replace the table
+            cache.store(name, new_table, cache_dir, checksum, etag)
+            changes[name] = Changes(new_df[code_column].to_numpy(), old_df[code_column].to_numpy(),
+                                    np.empty(0, np.int32))
+            continue
+        if table_changes:
+            old_table = feather.read_table(path, memory_map=True).replace_schema_metadata(None)
+            cache.store(name, apply(old_table, new_table, code_column, table_changes), cache_dir, checksum, etag)
+            changes[name] = table_changes
+            if name == "villages":
+                old_codes = old_df[code_column].to_numpy()
+                new_codes = new_df[code_column].to_numpy()
+                village_rows = (old_df[np.isin(old_codes, np.concatenate([table_changes.removed,
+                                                                         table_changes.changed]))],
+                                new_df[np.isin(new_codes, np.concatenate([table_changes.added,
+                                                                         table_changes.changed]))])
+        else:
+            # Same entities (e.g. only the serial numbers moved): the cached table stays as it is
+            cache.record_source(name, cache_dir, checksum, etag, len(old_df))
+
+    if changes or "validation" not in metadata:
+        dataset = data.LGDDataset(**{name: cache.read_table(cache.table_path(cache_dir, name)) for name in data.TABLES})
+        if metadata and set(changes) == {"villages"} and village_rows is not None:
+            removed, added = village_rows
+            metadata = summary.apply_village_changes(metadata, dataset.states, removed, added)
+            metadata = dict(metadata, memory=data.memory_usage(dataset), validation=validate.validate(dataset))
+        else:
+            metadata = data.derived_metadata(dataset)
+    # Stamp the (possibly unchanged) figures with the new data version
+    cache.write_metadata(cache_dir, metadata)
+    return changes, metadata
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Apply a new LGD snapshot to the local cache incrementally.")
+    parser.add_argument("--data-dir", type=Path, default=data.DATA_DIR, help="directory holding the new LGD CSVs")
+    parser.add_argument("--cache-dir", type=Path, default=data.CACHE_DIR, help="cache to update")
+    parser.add_argument("--base-url", default=data.BASE_URL, help="remote fallback for CSVs missing locally")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        changes = refresh(args.data_dir, args.cache_dir, args.base_url)
+    except validate.DataValidationError as e:
+        for finding in e.report["findings"]:
+            if finding["severity"] == "error":
+                print(f"error: {finding['table']}: {finding['message']}")
+        sys.exit(f"not applied: {e.report['errors']} validation errors; the cache is unchanged")
+    for name in data.TABLES:
+        print(f"{name}: {changes[name] if name in changes else 'unchanged'}")
+    report = cache.read_metadata(Path(args.cache_dir))["validation"]
+    print(f"refreshed in {time.perf_counter() - start:.1f}s; "
+          f"validation: {report['errors']} errors, {report['warnings']} warnings")
+
+
+if __name__ == "__main__":
+    main()
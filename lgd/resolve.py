@@ -0,0 +1,86 @@
+"""Bulk resolution of LGD codes to their full hierarchy.
+
+Resolves village (or sub-district / district) codes to codes and English
+names of every level above them, in vectorized chunks through the dense
+code -> row arrays of :class:`lgd.hierarchy.HierarchyIndex`::
+
+    python -m lgd.resolve parcels.csv --column "Village Code" -o parcels_lgd.parquet
+
+Throughput is reported on stderr in rows/sec.
+"""
+import argparse
+import sys
+import time
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from lgd.hierarchy import LEVELS, HierarchyIndex
+from lgd.io import ChunkWriter, read_chunks
+
+LEVEL_LABELS = {"states": "State", "districts": "District", "sub_districts": "Sub-District", "villages": "Village"}
+DEFAULT_CHUNKSIZE = 200_000
+
+
+def resolve(hierarchy: HierarchyIndex, codes, level: str = "villages") -> pd.DataFrame:
+    """Code and name of ``level`` and every level above it, one row per input code.
+
+    Unknown or non-numeric codes resolve to 0 / missing names.
+    """
+    codes = pd.to_numeric(pd.Series(codes), errors="coerce").fillna(-1).to_numpy(dtype=np.int64)
+    positions = hierarchy.positions(level, codes)
+
+    resolved = {}
+    for ancestor in LEVELS[:LEVELS.index(level) + 1]:
+        found = positions if ancestor == level else hierarchy.ancestor_positions(level, positions, ancestor)
+        known = found >= 0
+        label = LEVEL_LABELS[ancestor]
+        resolved[f"{label} Code"] = np.where(known, hierarchy.codes[ancestor][np.maximum(found, 0)], 0)
+        # A fixed string type, so a chunk with no known codes has the same schema as the others
+        resolved[f"{label} Name (In English)"] = pd.array(
+            np.where(known, hierarchy.names[ancestor][np.maximum(found, 0)], None), dtype="string[pyarrow]")
+    return pd.DataFrame(resolved)
+
+
+def resolve_chunks(hierarchy: HierarchyIndex, chunks: Iterable, level: str = "villages") -> Iterator[pd.DataFrame]:
+    """Lazily :func:`resolve` each chunk of codes, so inputs of any size stream in bounded memory."""
+    for chunk in chunks:
+        yield resolve(hierarchy, chunk, level)
+
+
+def resolve_file(hierarchy: HierarchyIndex, source, output, column: str, level: str = "villages",
+                 chunksize: int = DEFAULT_CHUNKSIZE) -> int:
+    """Append the resolved hierarchy to every row of a CSV or Parquet file, chunk by chunk.
+
+    The output format follows the extension of ``output`` (Parquet for ``.parquet``,
+    CSV otherwise). Returns the number of rows written.
+    """
+    with ChunkWriter(output) as writer:
+        for chunk in read_chunks(source, chunksize, dtype={column: "string"}):
+            resolved = resolve(hierarchy, chunk[column], level)
+            resolved.index = chunk.index
+            writer.write(chunk.join(resolved, rsuffix=" (LGD)"))
+    return writer.rows
+
+
+def main(argv: Optional[list] = None) -> None:
+    from lgd.data import load_dataset
+
+    parser = argparse.ArgumentParser(description="Resolve LGD codes in a CSV/Parquet file to their full hierarchy.")
+    parser.add_argument("input", help="CSV or .parquet file holding the codes ('-' for CSV on stdin)")
+    parser.add_argument("--column", default="Village Code", help="column holding the codes")
+    parser.add_argument("--level", default="villages", choices=LEVELS[1:], help="level the codes belong to")
+    parser.add_argument("-o", "--output", default="-", help="output CSV or .parquet file ('-' for CSV on stdout)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows resolved per chunk")
+    args = parser.parse_args(argv)
+
+    hierarchy = HierarchyIndex(load_dataset())
+    start = time.perf_counter()
+    rows = resolve_file(hierarchy, args.input, args.output, args.column, args.level, args.chunksize)
+    elapsed = time.perf_counter() - start
+    print(f"resolved {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Prebuilt substring indexes for the search boxes.
+
+Each searchable column is reduced to its distinct values, and a trigram
+index (trigram -> sorted value ids) is built over their lower-cased text.
+A query intersects the posting lists of its trigrams, verifies the few
+surviving candidates, and maps matching value ids back to row positions
+through a CSR-style value -> rows table. Results are the same rows that
+``df[col].astype(str).str.contains(term, case=False, regex=False)`` would
+select, without scanning every row on every keystroke.
+"""
+import copy
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from lgd import metrics
+
+# Columns each search box matches against, per dataset table
+SEARCH_COLUMNS: Dict[str, List[str]] = {
+    "states": ["State Name (In English)", "State LGD Code"],
+    "districts": ["District Name (In English)", "District LGD Code", "Hierarchy"],
+    "sub_districts": ["Sub-District Name (In English)", "Sub-District LGD Code", "Hierarchy"],
+    "villages": ["Village Name (In English)", "Village Code", "State Code", "State Name (In English)",
+                 "District Code", "District Name (In English)", "Sub-District Code",
+                 "Sub-District Name (In English)"],
+}
+
+_EMPTY = np.empty(0, dtype=np.int64)
+# Above this many candidate rows, SearchCache refinement goes through the index instead of testing rows
+REFINE_SCAN_ROWS = 4096
+
+
+def trigram_keys(codepoints: np.ndarray) -> np.ndarray:
+    """Pack every run of three code points into one uint64 key (21 bits per code point)."""
+    c = codepoints.astype(np.uint64)
+    return (c[:-2] << np.uint64(42)) | (c[1:-1] << np.uint64(21)) | c[2:]
+
+
+def to_codepoints(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+
+class TrigramPostings:
+    """Trigram -> ascending ids of the values containing it.
+
+    Built from the code points of NUL-terminated values laid end to end
+    (value ``i`` is the ``i``-th one), so no trigram spans two values.
+    """
+
+    def __init__(self, codepoints: np.ndarray):
+        if len(codepoints) < 3:
+            self.keys, self._offsets, self._ids = np.empty(0, np.uint64), np.zeros(1, np.int64), _EMPTY
+            return
+        owner = (np.cumsum(codepoints == 0) - (codepoints == 0)).astype(np.int32)
+        keys = trigram_keys(codepoints)
+        valid = (codepoints[:-2] != 0) & (codepoints[1:-1] != 0) & (codepoints[2:] != 0)
+        keys, ids = keys[valid], owner[:-2][valid]
+
+        # ids are already ascending, so a stable sort keeps each posting list sorted
+        order = np.argsort(keys, kind="stable")
+        keys, ids = keys[order], ids[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = (keys[1:] != keys[:-1]) | (ids[1:] != ids[:-1])
+        keys, ids = keys[first], ids[first]
+
+        self.keys, starts = np.unique(keys, return_index=True)
+        self._offsets = np.append(starts, len(keys)).astype(np.int64)
+        self._ids = ids
+
+    def get(self, key: np.uint64) -> np.ndarray:
+        i = np.searchsorted(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return _EMPTY
+        return self._ids[self._offsets[i]:self._offsets[i + 1]]
+
+
+def _intersect(postings: List[np.ndarray]) -> np.ndarray:
+    # Probe each (sorted) longer list for the survivors of the shorter ones instead of merging
+    candidates = postings[0]
+    for posting in postings[1:]:
+        if len(candidates) == 0:
+            break
+        pos = np.minimum(np.searchsorted(posting, candidates), len(posting) - 1)
+        candidates = candidates[posting[pos] == candidates]
+    return candidates
+
+
+def _factorize(values: pd.Series):
+    """Value id per row (-1 when missing) and the distinct values, lower-cased and NUL-joined."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    uniques = np.asarray(uniques)
+    if uniques.dtype.kind != "O":
+        uniques = uniques.astype(str)
+    # Values are joined with a NUL separator so no trigram spans two values
+    return codes, ("\x00".join(map(str, uniques)) + "\x00").lower()
+
+
+class ColumnIndex:
+    """Substring lookups over one column."""
+
+    def __init__(self, values: pd.Series):
+        codes, text = _factorize(values)
+        self.values = np.array(text.split("\x00")[:-1], dtype=object)
+
+        # Code points of every value, kept for one- and two-character queries
+        self._codepoints = to_codepoints(text)
+        self._starts = np.append(0, np.flatnonzero(self._codepoints == 0)[:-1] + 1)
+        self._trigrams = TrigramPostings(self._codepoints)
+        # Values first seen by updated() have their own (small) postings
+        self._indexed = len(self.values)
+        self._added_trigrams: Optional[TrigramPostings] = None
+        self._set_codes(codes)
+
+    def _set_codes(self, codes: np.ndarray) -> None:
+        # row -> value id, and value id -> row positions stored CSR-style (rows sorted by value id)
+        self._codes = np.asarray(codes, dtype=np.int32)
+        valid = self._codes >= 0
+        self._rows = np.flatnonzero(valid)[np.argsort(self._codes[valid], kind="stable")]
+        self._offsets = np.zeros(len(self.values) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._codes[valid], minlength=len(self.values)), out=self._offsets[1:])
+
+    def updated(self, values: pd.Series) -> "ColumnIndex":
+        """A copy of this index over a refreshed version of the column.
+
+        Rows are re-pointed at existing value ids and only values never seen
+        before are indexed, so the cost is one pass over the rows rather than a
+        rebuild of the trigram postings. This index is left untouched.
+        """
+        codes, text = _factorize(values)
+        index = copy.copy(self)
+        if len(text) == len(self._codepoints) and np.array_equal(to_codepoints(text), self._codepoints):
+            # Same distinct values (typical of the name categoricals): only rows moved
+            index._set_codes(codes)
+            return index
+
+        # One hash pass over old and new values; lower-casing can merge distinct values, the first id wins
+        lowered = np.array(text.split("\x00")[:-1], dtype=object)
+        keys = pd.factorize(np.concatenate([self.values, lowered]))[0]
+        first = np.full(keys.max(initial=-1) + 1, -1, dtype=np.int64)
+        first[keys[:len(self.values)][::-1]] = np.arange(len(self.values))[::-1]
+        ids = first[keys[len(self.values):]]
+
+        new = ids < 0
+        if new.any():
+            fresh, ids[new] = np.unique(lowered[new], return_inverse=True)
+            ids[new] += len(self.values)
+            codepoints = to_codepoints("\x00".join(fresh) + "\x00")
+            index.values = np.concatenate([self.values, fresh])
+            index._starts = np.append(self._starts, len(self._codepoints)
+                                      + np.append(0, np.flatnonzero(codepoints == 0)[:-1] + 1))
+            index._codepoints = np.concatenate([self._codepoints, codepoints])
+            index._added_trigrams = TrigramPostings(index._codepoints[index._starts[self._indexed]:])
+        index._set_codes(np.where(codes >= 0, ids[np.maximum(codes, 0)], -1) if len(ids) else codes)
+        return index
+
+    def _rows_for(self, value_ids: np.ndarray) -> np.ndarray:
+        if len(value_ids) == 0:
+            return _EMPTY
+        starts = self._offsets[value_ids]
+        lengths = self._offsets[np.asarray(value_ids) + 1] - starts
+        # Gather every value's slice of the CSR rows in one vectorized step
+        shift = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return self._rows[np.arange(lengths.sum()) + shift]
+
+    def matching_values(self, term: str) -> np.ndarray:
+        """Ids of the distinct values containing ``term`` (case-insensitive)."""
+        term = term.lower()
+        if len(term) < 3:
+            # Too short for the trigram index
+            return self._scan(term)
+        keys = np.unique(trigram_keys(to_codepoints(term)))
+        postings = sorted((self._trigrams.get(key) for key in keys), key=len)
+        if len(term) > 3 and len(postings[0]) > len(self.values) // 4:
+            # Unselective trigrams: one vectorized pass beats intersecting and verifying
+            return self._scan(term)
+        candidates = _intersect(postings)
+        if self._added_trigrams is not None:
+            added = _intersect(sorted((self._added_trigrams.get(key) for key in keys), key=len))
+            candidates = np.concatenate([candidates, added + self._indexed])
+        if len(term) == 3 or len(candidates) == 0:
+            return candidates
+        return candidates[[term in value for value in self.values[candidates]]]
+
+    def _scan(self, term: str) -> np.ndarray:
+        # Compare the code points of every distinct value directly
+        if not term:
+            return np.arange(len(self.values))
+        c = self._codepoints
+        pattern = to_codepoints(term)
+        hit = c[:len(c) - len(pattern) + 1] == pattern[0]
+        for k in range(1, len(pattern)):
+            hit &= c[k:len(c) - len(pattern) + 1 + k] == pattern[k]
+        owners = np.searchsorted(self._starts, np.flatnonzero(hit), side="right") - 1
+        keep = np.ones(len(owners), dtype=bool)
+        keep[1:] = owners[1:] != owners[:-1]
+        return owners[keep]
+
+    def search(self, term: str) -> np.ndarray:
+        """Row positions whose value contains ``term``."""
+        return self._rows_for(self.matching_values(term))
+
+    def refine(self, rows: np.ndarray, term: str) -> np.ndarray:
+        """Boolean mask over ``rows`` marking those whose value contains ``term``."""
+        ids = self._codes[rows]
+        if len(rows) > REFINE_SCAN_ROWS:
+            # Cheaper to look the term up in the index and gather than to test each row
+            matched = np.zeros(len(self.values) + 1, dtype=bool)  # last slot stands in for missing values (-1)
+            matched[self.matching_values(term)] = True
+            return matched[ids]
+        term = term.lower()
+        return np.fromiter((i >= 0 and term in self.values[i] for i in ids), dtype=bool, count=len(ids))
+
+
+class SearchIndex:
+    """Row-level search over several columns of one table (OR across columns)."""
+
+    def __init__(self, df: pd.DataFrame, columns: List[str]):
+        self.n_rows = len(df)
+        self.columns = {column: ColumnIndex(df[column]) for column in columns}
+
+    def updated(self, df: pd.DataFrame) -> "SearchIndex":
+        """A copy of this index over a refreshed version of its table (see :meth:`ColumnIndex.updated`)."""
+        index = copy.copy(self)
+        index.n_rows = len(df)
+        index.columns = {column: column_index.updated(df[column]) for column, column_index in self.columns.items()}
+        return index
+
+    def search(self, term: str, columns: Optional[List[str]] = None) -> np.ndarray:
+        """Sorted row positions matching ``term`` in any of ``columns`` (default: all)."""
+        hits = [self.columns[column].search(term) for column in (columns or self.columns)]
+        matched = np.zeros(self.n_rows, dtype=bool)
+        for rows in hits:
+            matched[rows] = True
+        return np.flatnonzero(matched)
+
+    def refine(self, rows: np.ndarray, term: str, columns: Optional[List[str]] = None) -> np.ndarray:
+        """The subset of ``rows`` (sorted positions) matching ``term``; only those rows are examined."""
+        matched = np.zeros(len(rows), dtype=bool)
+        for column in (columns or self.columns):
+            matched |= self.columns[column].refine(rows, term)
+        return rows[matched]
+
+
+class SearchCache:
+    """Bounded LRU of search results over one :class:`SearchIndex`, keyed by term.
+
+    A term that extends a cached one (contains it) can only match a subset of
+    that term's rows, so it is answered by refining the smallest such cached
+    result instead of searching the whole table. Typing a query one character
+    at a time therefore costs about one full search. Safe to share between
+    sessions.
+    """
+
+    def __init__(self, index: SearchIndex, max_entries: int = 256, version: Optional[str] = None):
+        self.index = index
+        self.max_entries = max_entries
+        # Data version the index was built from (see lgd.cache.data_version)
+        self.version = version
+        self._results: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def updated(self, df: pd.DataFrame, version: Optional[str]) -> "SearchCache":
+        """A cache for a refreshed version of the table, its index updated from this one's.
+
+        Only new values are indexed (see :meth:`SearchIndex.updated`). This cache
+        is left as it is, so searches still on the previous version keep
+        getting rows of the previous table.
+        """
+        return SearchCache(self.index.updated(df), self.max_entries, version)
+
+    def search(self, term: str) -> np.ndarray:
+        key = term.lower()
+        index = self.index
+        with self._lock:
+            rows = self._results.get(key)
+            if rows is not None:
+                self._results.move_to_end(key)
+                metrics.count("search_cache_requests_total", outcome="hit")
+                return rows
+            narrower = [rows for cached, rows in self._results.items() if cached in key]
+
+        base = min(narrower, key=len) if narrower else None
+        if base is not None and len(base) <= index.n_rows // 8:
+            metrics.count("search_cache_requests_total", outcome="refined")
+            rows = index.refine(base, key)
+        else:
+            metrics.count("search_cache_requests_total", outcome="searched")
+            rows = index.search(key)
+        rows.flags.writeable = False
+
+        with self._lock:
+            self._results[key] = rows
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return rows
+
+
+def build_indexes(dataset) -> Dict[str, SearchIndex]:
+    """One :class:`SearchIndex` per table of an :class:`lgd.data.LGDDataset`."""
+    return {table: SearchIndex(getattr(dataset, table), columns) for table, columns in SEARCH_COLUMNS.items()}
+
+
+def build_search_caches(dataset, max_entries: int = 256) -> Dict[str, SearchCache]:
+    """A :class:`SearchCache` per table, each over a freshly built index."""
+    return {table: SearchCache(index, max_entries, dataset.version) for table, index in build_indexes(dataset).items()}
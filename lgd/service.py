@@ -0,0 +1,338 @@
+"""Headless JSON lookup service over the LGD data, for machine clients.
+
+Runs on Tornado (already installed with Streamlit) and loads the data through
+the same cache and indexes as the app::
+
+    python -m lgd.service --port 8000 --processes 4
+
+Endpoints (all GET, JSON):
+
+* ``/v1/<level>``                   - every state (``level`` is ``states``)
+* ``/v1/<level>/<code>``            - one entity's record and its hierarchy
+* ``/v1/<level>/<code>/children``   - direct children, or ``?level=villages``
+  for any level below; paged with ``limit``/``offset``
+* ``/v1/search?q=...&table=villages`` - substring search over names and codes,
+  ``&fuzzy=1`` for fuzzy name matching; paged
+* ``/v1/convert?value=...&from=Acre&to=Hectare`` - area conversion (``value`` may repeat)
+* ``/v1/version``, ``/healthz``, ``/metrics`` (Prometheus text, see :mod:`lgd.metrics`)
+
+Connections are kept alive (HTTP/1.1). Responses carry an ``ETag`` made from
+the data version and the request URL, so ``If-None-Match`` is answered with
+304 before any lookup runs. Bodies up to :data:`MAX_CACHED_BODY` are kept in
+a per-process LRU bounded by :data:`RESPONSE_CACHE_BYTES`. When the
+cache is refreshed (``python -m lgd.refresh``) the service reloads the data
+in the background and moves its indexes to the new version.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import tornado.netutil
+import tornado.process
+import tornado.web
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+from lgd import cache, data, metrics
+from lgd.fuzzy import FUZZY_COLUMNS, FuzzyIndex, build_fuzzy_index
+from lgd.hierarchy import CODE_COLUMNS, LEVELS, HierarchyIndex
+from lgd.resolve import resolve
+from lgd.search import SEARCH_COLUMNS, SearchCache, build_search_caches
+from lgd.units import UNITS, convert_array
+
+DEFAULT_PORT = 8000
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Bytes of response bodies kept per process, keyed by request URL
+RESPONSE_CACHE_BYTES = 64 * 2 ** 20
+# Larger bodies (long pages of full records) are rebuilt on each request rather than cached
+MAX_CACHED_BODY = 256 * 2 ** 10
+# Seconds between checks of the cache's data version
+RELOAD_INTERVAL = 30
+_LEVEL = "(" + "|".join(LEVELS) + ")"
+
+
+class LookupState:
+    """The dataset, its indexes and the response cache for one data version.
+
+    Replaced as a whole when the data changes, so a request sees one version throughout.
+    """
+
+    def __init__(self, dataset: data.LGDDataset, previous: Optional["LookupState"] = None):
+        self.dataset = dataset
+        self.version = dataset.version or "unversioned"
+        self.hierarchy = HierarchyIndex(dataset)
+        if previous is None:
+            self.search: Dict[str, SearchCache] = build_search_caches(dataset)
+        else:
+            # Updated from the previous state's indexes, as the app does after a refresh; those are left
+            # as they are, since the previous state keeps answering requests until this one replaces it
+            self.search = {table: search_cache.updated(getattr(dataset, table), dataset.version)
+                           for table, search_cache in previous.search.items()}
+        self._fuzzy: Dict[str, FuzzyIndex] = {}
+        self._responses: "OrderedDict[str, bytes]" = OrderedDict()
+        self._response_bytes = 0
+        self._lock = threading.Lock()
+
+    def fuzzy(self, table: str) -> FuzzyIndex:
+        with self._lock:
+            index = self._fuzzy.get(table)
+        if index is None:
+            # Built on first use; two racing requests may both build it, the last one wins
+            index = build_fuzzy_index(self.dataset, table)
+            with self._lock:
+                self._fuzzy[table] = index
+        return index
+
+    def etag(self, url: str) -> str:
+        return '"' + hashlib.sha1(f"{self.version} {url}".encode()).hexdigest() + '"'
+
+    def cached_response(self, url: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._responses.get(url)
+            if body is not None:
+                self._responses.move_to_end(url)
+            return body
+
+    def cache_response(self, url: str, body: bytes) -> None:
+        if len(body) > MAX_CACHED_BODY:
+            return
+        with self._lock:
+            previous = self._responses.pop(url, None)
+            self._response_bytes += len(body) - (len(previous) if previous is not None else 0)
+            self._responses[url] = body
+            while self._response_bytes > RESPONSE_CACHE_BYTES:
+                self._response_bytes -= len(self._responses.popitem(last=False)[1])
+
+
+class LookupService:
+    """Loads the dataset and keeps :attr:`state` on the cache's current data version."""
+
+    def __init__(self, base_url: str = data.BASE_URL, data_dir: Path = data.DATA_DIR,
+                 cache_dir: Optional[Path] = data.CACHE_DIR):
+        self._source = (base_url, data_dir, cache_dir)
+        self.state = LookupState(data.load_dataset(*self._source))
+        # Searches, fuzzy index builds and reloads run off the event loop; created in serve(), after any fork
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    async def reload_if_changed(self) -> None:
+        cache_dir = self._source[2]
+        version = cache.data_version(Path(cache_dir)) if cache_dir is not None else None
+        if version is None or version == self.state.version:
+            return
+        state = await IOLoop.current().run_in_executor(
+            self.executor, lambda: LookupState(data.load_dataset(*self._source), previous=self.state))
+        self.state = state
+
+
+def _records(df) -> list:
+    # to_dict("records") returns plain Python scalars, which json can encode
+    return df.to_dict("records")
+
+
+class JSONHandler(tornado.web.RequestHandler):
+    """GET handler serving ``lookup()`` as cached, ETagged JSON."""
+
+    def initialize(self, service: LookupService):
+        self.service = service
+
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+
+    def compute_etag(self):
+        # Set explicitly in get(), before the lookup runs
+        return None
+
+    async def get(self, *args):
+        state = self.service.state
+        url = self.request.uri
+        self.set_header("Etag", state.etag(url))
+        self.set_header("Cache-Control", "public, max-age=60")
+        if self.check_etag_header():
+            metrics.count("api_responses_total", outcome="not_modified")
+            self.set_status(304)
+            return
+
+        body = state.cached_response(url)
+        if body is None:
+            metrics.count("api_responses_total", outcome="computed")
+            with metrics.stage("api", endpoint=type(self).__name__):
+                payload = await self.lookup(state, *args)
+            body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            state.cache_response(url, body)
+        else:
+            metrics.count("api_responses_total", outcome="cached")
+        self.finish(body)
+
+    async def lookup(self, state: LookupState, *args):
+        raise NotImplementedError
+
+    def in_executor(self, func, *args):
+        return IOLoop.current().run_in_executor(self.service.executor, func, *args)
+
+    def page(self):
+        try:
+            limit = int(self.get_argument("limit", str(DEFAULT_LIMIT)))
+            offset = int(self.get_argument("offset", "0"))
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="limit and offset must be integers")
+        return max(0, min(limit, MAX_LIMIT)), max(0, offset)
+
+    def write_error(self, status_code, **kwargs):
+        self.clear_header("Etag")
+        self.finish({"error": self._reason, "status": status_code})
+
+
+class LevelHandler(JSONHandler):
+    async def lookup(self, state, level):
+        if level != "states":
+            raise tornado.web.HTTPError(404, reason="only states can be listed; use /v1/<level>/<code>/children")
+        hierarchy = state.hierarchy
+        return {"items": [{"code": int(code), "name": name}
+                          for code, name in zip(hierarchy.codes["states"], hierarchy.names["states"])]}
+
+
+class EntityHandler(JSONHandler):
+    async def lookup(self, state, level, code):
+        code = int(code)
+        position = state.hierarchy.position(level, code)
+        if position < 0:
+            raise tornado.web.HTTPError(404, reason=f"no {level} entry with code {code}")
+        table = getattr(state.dataset, level)
+        return {"level": level, "code": code, "record": _records(table.iloc[[position]])[0],
+                "hierarchy": _records(resolve(state.hierarchy, [code], level))[0]}
+
+
+class ChildrenHandler(JSONHandler):
+    async def lookup(self, state, level, code):
+        code = int(code)
+        below = LEVELS[LEVELS.index(level) + 1:]
+        descendant = self.get_argument("level", below[0] if below else level)
+        if descendant not in below:
+            raise tornado.web.HTTPError(400, reason=f"level must be one of {', '.join(below) or 'none'}")
+        hierarchy = state.hierarchy
+        if hierarchy.position(level, code) < 0:
+            raise tornado.web.HTTPError(404, reason=f"no {level} entry with code {code}")
+        limit, offset = self.page()
+        positions = hierarchy.descendants(level, code, descendant)
+        page = positions[offset:offset + limit]
+        return {"level": descendant, "total": len(positions), "offset": offset,
+                "items": [{"code": int(child), "name": name}
+                          for child, name in zip(hierarchy.codes[descendant][page], hierarchy.names[descendant][page])]}
+
+
+class SearchHandler(JSONHandler):
+    async def lookup(self, state, *args):
+        query = self.get_argument("q", "").strip()
+        table = self.get_argument("table", "villages")
+        fuzzy = self.get_argument("fuzzy", "0") not in ("0", "false", "")
+        if not query:
+            raise tornado.web.HTTPError(400, reason="q is required")
+        if table not in (FUZZY_COLUMNS if fuzzy else SEARCH_COLUMNS):
+            raise tornado.web.HTTPError(400, reason=f"cannot {'fuzzy-' if fuzzy else ''}search {table!r}")
+        limit, offset = self.page()
+        df = getattr(state.dataset, table)
+
+        if fuzzy:
+            positions, distances = await self.in_executor(
+                lambda: state.fuzzy(table).search(query, k=offset + limit))
+            items = _records(df.iloc[positions[offset:]])
+            for item, distance in zip(items, distances[offset:].tolist()):
+                item["Match Distance"] = distance
+            # Fuzzy results are ranked and cut at offset + limit, so there is no total
+            return {"table": table, "offset": offset, "items": items}
+
+        positions = await self.in_executor(state.search[table].search, query)
+        return {"table": table, "total": len(positions), "offset": offset,
+                "items": _records(df.iloc[positions[offset:offset + limit]])}
+
+
+class ConvertHandler(JSONHandler):
+    async def lookup(self, state, *args):
+        from_unit, to_unit = self.get_argument("from", ""), self.get_argument("to", "")
+        for unit in (from_unit, to_unit):
+            if unit not in UNITS:
+                raise tornado.web.HTTPError(400, reason=f"unknown unit {unit!r}; expected one of {', '.join(UNITS)}")
+        try:
+            values = np.array([float(value) for value in self.get_arguments("value")], dtype=float)
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="value must be a number")
+        with np.errstate(over="ignore"):
+            converted = convert_array(values, from_unit, to_unit)
+        # JSON has no NaN or Infinity, so non-finite values (or results that overflow) are refused
+        if not (np.isfinite(values).all() and np.isfinite(converted).all()):
+            raise tornado.web.HTTPError(400, reason="value must be a finite number within range")
+        return {"from": from_unit, "to": to_unit, "values": values.tolist(), "converted": converted.tolist()}
+
+
+class VersionHandler(JSONHandler):
+    async def lookup(self, state, *args):
+        return {"version": state.version,
+                "rows": {table: len(getattr(state.dataset, table)) for table in CODE_COLUMNS}}
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.finish({"status": "ok"})
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.finish(metrics.prometheus_text())
+
+
+def make_app(service: LookupService) -> tornado.web.Application:
+    args = {"service": service}
+    return tornado.web.Application([
+        (r"/v1/search", SearchHandler, args),
+        (r"/v1/convert", ConvertHandler, args),
+        (r"/v1/version", VersionHandler, args),
+        (rf"/v1/{_LEVEL}", LevelHandler, args),
+        (rf"/v1/{_LEVEL}/(\d+)", EntityHandler, args),
+        (rf"/v1/{_LEVEL}/(\d+)/children", ChildrenHandler, args),
+        (r"/healthz", HealthHandler),
+        (r"/metrics", MetricsHandler),
+    ])
+
+
+async def serve(service: LookupService, sockets, reload_interval: float = RELOAD_INTERVAL) -> None:
+    service.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="lgd-service")
+    server = HTTPServer(make_app(service), idle_connection_timeout=60)
+    server.add_sockets(sockets)
+    if reload_interval > 0:
+        PeriodicCallback(service.reload_if_changed, reload_interval * 1000).start()
+    await asyncio.Event().wait()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Serve LGD lookups as a JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--processes", type=int, default=1,
+                        help="worker processes sharing the port (0: one per CPU); they share the mapped dataset")
+    parser.add_argument("--data-dir", type=Path, default=data.DATA_DIR)
+    parser.add_argument("--cache-dir", type=Path, default=data.CACHE_DIR)
+    parser.add_argument("--base-url", default=data.BASE_URL)
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL,
+                        help="seconds between checks for refreshed data (0 to disable)")
+    args = parser.parse_args(argv)
+
+    sockets = tornado.netutil.bind_sockets(args.port, args.host)
+    # Built before forking so the workers share the dataset and indexes instead of each building them
+    service = LookupService(args.base_url, args.data_dir, args.cache_dir)
+    if args.processes != 1:
+        tornado.process.fork_processes(args.processes)
+    print(f"serving LGD lookups on http://{args.host}:{args.port}/v1/ (data version {service.state.version})")
+    asyncio.run(serve(service, sockets, args.reload_interval))
+
+
+if __name__ == "__main__":
+    main()
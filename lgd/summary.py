@@ -0,0 +1,56 @@
+"""Dataset-level figures: KPI counts and the State Wise Records table.
+
+They only change when the data does, so :func:`dataset_metadata` computes
+them once per data version and the cache stores them beside the tables.
+"""
+import pandas as pd
+
+from lgd.hierarchy import CODE_COLUMNS, NAME_COLUMNS, parent_links
+
+STATE_WISE_COLUMNS = ["States", "Districts", "Sub-Districts", "Villages"]
+
+
+def state_wise_records(dataset) -> pd.DataFrame:
+    """District, sub-district and village counts per state, joined on LGD codes."""
+    district_state, sub_district_district = parent_links(dataset)
+    sub_district_state = sub_district_district.map(district_state)
+
+    counts = pd.DataFrame({
+        "Districts": district_state.groupby(district_state.to_numpy()).size(),
+        "Sub-Districts": sub_district_state.groupby(sub_district_state.to_numpy()).size(),
+        "Villages": dataset.villages.groupby("State Code", observed=True).size(),
+    })
+
+    states = dataset.states
+    stats_table = pd.DataFrame({"States": states[NAME_COLUMNS["states"]].astype(str).to_numpy()})
+    codes = states[CODE_COLUMNS["states"]].to_numpy()
+    for column in STATE_WISE_COLUMNS[1:]:
+        stats_table[column] = counts[column].reindex(codes).fillna(0).astype(int).to_numpy()
+    return stats_table.sort_values("Districts", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def kpis(dataset) -> dict:
+    """Distinct LGD codes per level, as shown in the KPI tiles."""
+    return {level: int(getattr(dataset, level)[column].nunique()) for level, column in CODE_COLUMNS.items()}
+
+
+def dataset_metadata(dataset) -> dict:
+    """Everything the KPI tiles and the State Wise Records table render, as plain JSON data."""
+    return {"kpis": kpis(dataset), "state_wise_records": state_wise_records(dataset).to_dict("records")}
+
+
+def apply_village_changes(metadata: dict, states: pd.DataFrame, removed: pd.DataFrame, added: pd.DataFrame) -> dict:
+    """``metadata`` after the village rows ``removed`` were replaced by ``added``, without recounting.
+
+    Changed villages appear in both frames (old and new row), so only the
+    village KPI and the per-state village counts move.
+    """
+    delta = added.groupby("State Code").size().sub(removed.groupby("State Code").size(), fill_value=0)
+    state_names = pd.Series(states[NAME_COLUMNS["states"]].astype(str).to_numpy(),
+                            index=states[CODE_COLUMNS["states"]].to_numpy())
+    delta = delta.groupby(state_names.reindex(delta.index).to_numpy()).sum()
+
+    records = [dict(record, Villages=int(record["Villages"] + delta.get(record["States"], 0)))
+               for record in metadata["state_wise_records"]]
+    kpis = dict(metadata["kpis"], villages=metadata["kpis"]["villages"] + len(added) - len(removed))
+    return dict(metadata, kpis=kpis, state_wise_records=records)
@@ -0,0 +1,109 @@
+"""Area unit conversion.
+
+All factors are kept in one N x N matrix (``FACTOR_MATRIX[i, j]`` converts unit
+``i`` to unit ``j``), so converting a scalar, a whole conversion table row or
+millions of parcel areas with per-row units is a NumPy lookup and multiply::
+
+    python -m lgd.units parcels.csv --value-column Area --unit-column Unit --to Hectare -o parcels_ha.parquet
+"""
+import argparse
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from lgd.io import ChunkWriter, read_chunks
+
+# Conversion factors from each unit to square meters
+CONVERSION_FACTORS = {
+    "Acre": 4046.86,
+    "Hectare": 10000,
+    "Bigha": 1337.8,
+    "Square meter": 1,
+    "Square feet": 0.092903,
+    "Biswa": 125.42,
+    "Guntha": 101.17,
+    "Square yard": 0.836127,
+    "Cent": 40.4686,
+    "Ground": 222.967,
+    "Biswani": 50.93,
+    "Dhur": 16.929,
+    "Kanal": 505.857,
+    "Katha": 126.441,
+    "Chatak": 33.528,
+    "Ghumao": 24281.13,
+    "Killa": 4046.86,
+    "Ankanam": 2.323,
+    "Decimal": 40.4686
+}
+UNITS = list(CONVERSION_FACTORS)
+
+_FACTORS = np.array([CONVERSION_FACTORS[unit] for unit in UNITS], dtype=np.float64)
+FACTOR_MATRIX = _FACTORS[:, None] / _FACTORS[None, :]
+FACTOR_MATRIX.flags.writeable = False
+DEFAULT_CHUNKSIZE = 500_000
+
+
+def unit_index(units) -> np.ndarray:
+    """Row/column of ``FACTOR_MATRIX`` for each unit name (-1 for unknown units)."""
+    units = np.asarray(units, dtype=object)
+    codes = pd.Categorical(units.ravel(), categories=UNITS).codes.astype(np.int64)
+    return codes.reshape(units.shape)
+
+
+def convert(value: float, from_unit: str, to_unit: str) -> float:
+    """Convert one area value from ``from_unit`` to ``to_unit``."""
+    return value * FACTOR_MATRIX[UNITS.index(from_unit), UNITS.index(to_unit)]
+
+
+def conversion_row(value: float, from_unit: str) -> np.ndarray:
+    """``value`` expressed in every unit, in ``UNITS`` order."""
+    return value * FACTOR_MATRIX[UNITS.index(from_unit)]
+
+
+def convert_array(values, from_units, to_units) -> np.ndarray:
+    """Vectorized conversion; ``from_units``/``to_units`` are one unit name or one per value.
+
+    Values with an unknown unit convert to NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    source = np.broadcast_to(unit_index(from_units), values.shape)
+    target = np.broadcast_to(unit_index(to_units), values.shape)
+    factors = FACTOR_MATRIX[source, target]
+    return np.where((source >= 0) & (target >= 0), values * factors, np.nan)
+
+
+def convert_file(source, output, value_column: str, to_unit: str, unit_column: Optional[str] = None,
+                 from_unit: Optional[str] = None, chunksize: int = DEFAULT_CHUNKSIZE) -> int:
+    """Stream a CSV/Parquet file, adding ``<value_column> (<to_unit>)``. Returns the number of rows."""
+    with ChunkWriter(output) as writer:
+        for chunk in read_chunks(source, chunksize, dtype={value_column: "float64"}):
+            units = chunk[unit_column].to_numpy() if unit_column else from_unit
+            chunk[f"{value_column} ({to_unit})"] = convert_array(chunk[value_column].to_numpy(), units, to_unit)
+            writer.write(chunk)
+    return writer.rows
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Convert a column of areas between units.")
+    parser.add_argument("input", help="CSV or .parquet file ('-' for CSV on stdin)")
+    parser.add_argument("--value-column", required=True, help="column holding the area values")
+    units = parser.add_mutually_exclusive_group(required=True)
+    units.add_argument("--unit-column", help="column holding each row's unit")
+    units.add_argument("--from", dest="from_unit", choices=UNITS, help="unit of every row")
+    parser.add_argument("--to", dest="to_unit", required=True, choices=UNITS, help="target unit")
+    parser.add_argument("-o", "--output", default="-", help="output CSV or .parquet file ('-' for CSV on stdout)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows converted per chunk")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rows = convert_file(args.input, args.output, args.value_column, args.to_unit, args.unit_column, args.from_unit,
+                        args.chunksize)
+    elapsed = time.perf_counter() - start
+    print(f"converted {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
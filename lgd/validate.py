@@ -0,0 +1,201 @@
+"""Integrity checks on the LGD tables, run once per data version at ingest.
+
+The CSV readers in :mod:`lgd.data` clean and type the tables (missing codes
+become 0) before they are cached. :func:`validate` then checks the typed
+tables for duplicate and missing LGD codes, villages pointing at unknown
+states, districts or sub-districts, missing Census 2011 codes and names or
+``Hierarchy`` labels that disagree with the codes. The report is stored with
+the cached metadata, so loading never repeats the checks.
+:func:`raise_for_errors` refuses a dataset with errors, while warnings are
+only reported. Run on its own, the check builds the candidate tables in a
+staging copy and leaves the serving cache as it is::
+
+    python -m lgd.validate --data-dir Data --cache-dir .lgd_cache
+"""
+import argparse
+import json
+import sys
+from dataclasses import asdict, dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from lgd.hierarchy import CODE_COLUMNS, LEVELS, NAME_COLUMNS, VILLAGE_PARENT_COLUMNS, label_names, parent_links
+
+CENSUS_COLUMNS = {"states": "Census2011 Code", "districts": "Census2011 Code",
+                  "sub_districts": "Census2011 Code", "villages": "Census 2011 Code"}
+# LGD codes listed per finding
+SAMPLE = 10
+
+
+class DataValidationError(ValueError):
+    """The dataset failed validation; ``report`` holds every finding."""
+
+    def __init__(self, report: dict):
+        self.report = report
+        errors = [finding for finding in report["findings"] if finding["severity"] == "error"]
+        super().__init__(f"LGD data failed validation with {len(errors)} error(s): "
+                         + "; ".join(f"{finding['table']}: {finding['message']}" for finding in errors))
+
+
+@dataclass(frozen=True)
+class Finding:
+    check: str
+    table: str
+    severity: str  # "error" makes the dataset unusable, "warning" is only reported
+    count: int
+    message: str
+    sample: list  # LGD codes of affected rows, at most SAMPLE
+
+
+def _finding(check: str, table: str, severity: str, codes: np.ndarray, message: str) -> Finding:
+    return Finding(check, table, severity, len(codes), message,
+                   [int(code) for code in pd.unique(np.asarray(codes))[:SAMPLE]])
+
+
+def check_codes(dataset) -> List[Finding]:
+    """Every row has an LGD code, and no code appears twice."""
+    findings = []
+    for table, column in CODE_COLUMNS.items():
+        df = getattr(dataset, table)
+        if df.empty:
+            findings.append(Finding("empty_table", table, "error", 0, "table has no rows", []))
+            continue
+        codes = df[column].to_numpy()
+        missing = codes == 0
+        if missing.any():
+            findings.append(Finding("missing_codes", table, "error", int(missing.sum()),
+                                    f"{int(missing.sum())} rows without a {column}", []))
+        duplicated = pd.Index(codes[~missing]).duplicated(keep=False)
+        if duplicated.any():
+            findings.append(_finding("duplicate_codes", table, "error", codes[~missing][duplicated],
+                                     f"{int(duplicated.sum())} rows share a {column} with another row"))
+    return findings
+
+
+def check_census_codes(dataset) -> List[Finding]:
+    """Rows without a Census 2011 code (new or renamed entities have none)."""
+    findings = []
+    for table, column in CENSUS_COLUMNS.items():
+        df = getattr(dataset, table)
+        missing = df[column].to_numpy() == 0
+        if missing.any():
+            findings.append(_finding("missing_census_codes", table, "warning",
+                                     df[CODE_COLUMNS[table]].to_numpy()[missing],
+                                     f"{int(missing.sum())} rows without a {column}"))
+    return findings
+
+
+def check_references(dataset) -> List[Finding]:
+    """Every state, district and sub-district code a village carries exists in that table."""
+    villages = dataset.villages
+    village_codes = villages[CODE_COLUMNS["villages"]].to_numpy()
+    findings = []
+    for ancestor, column in VILLAGE_PARENT_COLUMNS.items():
+        codes = villages[column].to_numpy()
+        missing = codes == 0
+        unknown = ~missing & ~np.isin(codes, getattr(dataset, ancestor)[CODE_COLUMNS[ancestor]].to_numpy())
+        if missing.any():
+            findings.append(_finding("missing_parent_codes", "villages", "warning", village_codes[missing],
+                                     f"{int(missing.sum())} villages without a {column}"))
+        if unknown.any():
+            findings.append(_finding("unknown_parent_codes", "villages", "error", village_codes[unknown],
+                                     f"{int(unknown.sum())} villages with a {column} missing from {ancestor} "
+                                     f"({', '.join(map(str, pd.unique(codes[unknown])[:SAMPLE]))})"))
+    return findings
+
+
+def _village_name_mismatches(dataset, ancestor: str) -> np.ndarray:
+    # Codes of villages whose copy of an ancestor's name differs from the ancestor table's
+    villages, parents = dataset.villages, getattr(dataset, ancestor)
+    names = villages[NAME_COLUMNS[ancestor]].astype("category")
+    categories = np.asarray(names.cat.categories.astype(str).str.strip())
+    # One key per distinct (code, name) pair, so each pair is compared once rather than every row
+    keys = (villages[VILLAGE_PARENT_COLUMNS[ancestor]].to_numpy().astype(np.int64) * (len(categories) + 1)
+            + names.cat.codes.to_numpy() + 1)
+    unique_keys = pd.unique(keys)
+    pair_codes, pair_names = np.divmod(unique_keys, len(categories) + 1)
+
+    expected = pd.Series(parents[NAME_COLUMNS[ancestor]].astype(str).str.strip().to_numpy(),
+                         index=parents[CODE_COLUMNS[ancestor]].to_numpy())
+    expected = expected[~expected.index.duplicated()].reindex(pair_codes).to_numpy()
+    actual = categories[np.maximum(pair_names - 1, 0)] if len(categories) else np.full(len(pair_names), None)
+    wrong = unique_keys[(pair_names > 0) & pd.notna(expected) & (actual != expected)]
+    return villages[CODE_COLUMNS["villages"]].to_numpy()[np.isin(keys, wrong)]
+
+
+def check_names(dataset) -> List[Finding]:
+    """Names and ``Hierarchy`` labels agree with the entities the codes point at."""
+    findings = []
+    for ancestor in VILLAGE_PARENT_COLUMNS:
+        mismatched = _village_name_mismatches(dataset, ancestor)
+        if len(mismatched):
+            findings.append(_finding("name_mismatch", "villages", "warning", mismatched,
+                                     f"{len(mismatched)} villages whose {NAME_COLUMNS[ancestor]} differs from "
+                                     f"the name in {ancestor}"))
+
+    district_state, sub_district_district = parent_links(dataset)
+    for table, parents, ancestor, kind in (("districts", district_state, "states", "State"),
+                                           ("sub_districts", sub_district_district, "districts", "District")):
+        df = getattr(dataset, table)
+        unplaced = parents.to_numpy() == 0
+        if unplaced.any():
+            findings.append(_finding("unplaced", table, "warning", df[CODE_COLUMNS[table]].to_numpy()[unplaced],
+                                     f"{int(unplaced.sum())} {table} whose {ancestor[:-1]} cannot be determined"))
+        # The parent named in the Hierarchy label vs the parent the codes give
+        parent_df = getattr(dataset, ancestor)
+        parent_names = pd.Series(parent_df[NAME_COLUMNS[ancestor]].astype(str).str.strip().to_numpy(),
+                                 index=parent_df[CODE_COLUMNS[ancestor]].to_numpy())
+        actual = parent_names[~parent_names.index.duplicated()].reindex(parents.to_numpy()).to_numpy()
+        labelled = label_names(pd.Series(df["Hierarchy"].to_numpy()), kind).to_numpy()
+        differs = pd.notna(actual) & pd.notna(labelled) & (actual != labelled)
+        if differs.any():
+            findings.append(_finding("hierarchy_mismatch", table, "warning",
+                                     df[CODE_COLUMNS[table]].to_numpy()[differs],
+                                     f"{int(differs.sum())} {table} whose Hierarchy names a different "
+                                     f"{ancestor[:-1]} than their codes"))
+    return findings
+
+
+def validate(dataset) -> dict:
+    """Run every check; the report is plain JSON data: error and warning counts plus the findings."""
+    findings = check_codes(dataset)
+    if not any(finding.check == "empty_table" for finding in findings):
+        findings += check_census_codes(dataset) + check_references(dataset) + check_names(dataset)
+    findings.sort(key=lambda finding: (finding.severity != "error", LEVELS.index(finding.table)))
+    return {"errors": sum(finding.severity == "error" for finding in findings),
+            "warnings": sum(finding.severity == "warning" for finding in findings),
+            "findings": [asdict(finding) for finding in findings]}
+
+
+def raise_for_errors(report: dict) -> None:
+    """Raise :class:`DataValidationError` when ``report`` has errors."""
+    if report["errors"]:
+        raise DataValidationError(report)
+
+
+def main(argv=None) -> None:
+    from pathlib import Path
+
+    from lgd import data
+
+    parser = argparse.ArgumentParser(description="Validate LGD CSVs without touching the cache, writing a report.")
+    parser.add_argument("--data-dir", type=Path, default=data.DATA_DIR)
+    parser.add_argument("--cache-dir", type=Path, default=data.CACHE_DIR,
+                        help="the candidate is built in a staging copy beside this cache, which stays as it is")
+    parser.add_argument("--base-url", default=data.BASE_URL)
+    parser.add_argument("-o", "--output", type=Path, help="report file (default: validation.json in the cache)")
+    args = parser.parse_args(argv)
+
+    report = data.ingest(args.data_dir, args.cache_dir, args.base_url, publish=False)["validation"]
+    output = args.output or args.cache_dir / "validation.json"
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    for finding in report["findings"]:
+        print(f"{finding['severity']}: {finding['table']}: {finding['message']}")
+    print(f"{report['errors']} errors, {report['warnings']} warnings; report written to {output}")
+    sys.exit(1 if report["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,191 @@
-import requests
 import pandas as pd
 from PIL import Image
 import streamlit as st
+import os
+import threading
 import warnings
-from io import BytesIO
+from concurrent.futures import Future, ThreadPoolExecutor
 import plotly.graph_objects as go
+from lgd import cache, export, metrics
+from lgd.data import CACHE_DIR, LGDDataset, load_dataset
+from lgd.fuzzy import FUZZY_COLUMNS, FuzzyIndex
+from lgd.hierarchy import HierarchyIndex
+from lgd.search import SEARCH_COLUMNS, SearchCache, SearchIndex
+from lgd.summary import STATE_WISE_COLUMNS
+from lgd.units import UNITS, conversion_row, convert
 warnings.filterwarnings('ignore')
 
-def main():
+# Bundled with the repo so the first paint never waits on the network
+PROFILE_ICON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data", "img_1.png")
+
+
+def data_version():
+    # Changes whenever the cache is rebuilt or refreshed (python -m lgd.refresh); keys everything derived
+    return cache.data_version(CACHE_DIR)
+
+
+@metrics.cached(st.cache_resource(max_entries=1))
+def prefetch_lgd_data(version) -> Future:
+    # Started before anything renders, so the tables load while the converter is on screen
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="lgd-load").submit(load_dataset)
+
+
+@metrics.cached(st.cache_resource(max_entries=1))
+def load_lgd_data(version) -> LGDDataset:
+    # One read-only dataset per process, shared by every session (st.cache_data would hand each caller a
+    # pickled copy); its tables are memory-mapped from the cache, so worker processes share them too
+    try:
+        return prefetch_lgd_data(version).result()
+    except Exception:
+        # Let the next rerun try again instead of replaying the failure
+        prefetch_lgd_data.clear()
+        raise
+
+
+# Indexes are cached per data version and built from the rows passed with it (the leading underscore keeps
+# them out of the cache key). Up to two versions are kept: after a refresh, fragment reruns of sessions that
+# have not fully rerun yet still search the previous version's tables.
+@st.cache_resource
+def latest_search_caches() -> tuple[dict[str, SearchCache], threading.Lock]:
+    # The most recently built search cache per table, which the next version's is updated from
+    return {}, threading.Lock()
+
+
+@metrics.cached(st.cache_resource(max_entries=2 * len(SEARCH_COLUMNS)))
+def search_cache(table, version, _df) -> SearchCache:
+    # After a refresh the index is updated from the previous version's instead of being rebuilt; that one
+    # is left untouched for sessions still on it. The result LRUs are shared by every session of a version.
+    latest, lock = latest_search_caches()
+    with lock:
+        previous = latest.get(table)
+    if previous is None:
+        cached = SearchCache(SearchIndex(_df, SEARCH_COLUMNS[table]), version=version)
+    else:
+        with metrics.stage("index_update", table=table):
+            cached = previous.updated(_df, version)
+    with lock:
+        latest[table] = cached
+    return cached
+
+
+@metrics.cached(st.cache_resource(max_entries=2 * len(FUZZY_COLUMNS)))
+def load_fuzzy_index(table, version, _df) -> FuzzyIndex:
+    # Built on first use of a table's "Fuzzy match" toggle, then shared by every session
+    return FuzzyIndex(_df, FUZZY_COLUMNS[table])
+
+
+@metrics.cached(st.cache_resource(max_entries=2))
+def load_hierarchy(version, _dataset) -> HierarchyIndex:
+    return HierarchyIndex(_dataset)
+
+
+# Search hits are rendered a page at a time and downloaded in parts of at most EXPORT_ROWS rows
+PAGE_SIZES = [25, 50, 100, 500]
+EXPORT_ROWS = int(os.environ.get("LGD_EXPORT_ROWS", 100_000))
+
+
+# Exports are not cached: the encoded file only has to live until the one download it was prepared for
+def results_export(df, table, search_term, part, fmt, version):
+    positions = search_cache(table, version, df).search(search_term)
+    with metrics.stage("export", table=table):
+        return export.to_bytes(df, positions[(part - 1) * EXPORT_ROWS:part * EXPORT_ROWS], fmt)
+
+
+def subtree_export(df, hierarchy, level, code, table, fmt):
+    # Rows come straight from the hierarchy index, encoded a chunk at a time
+    positions = export.subtree_positions(hierarchy, level, code, table)
+    with metrics.stage("export", table=table):
+        return export.to_bytes(df, positions, fmt)
+
+
+def render_results(df, positions, table, search_term, version):
+    total = len(positions)
+    st.write(":blue[Filtered results:]", (total, df.shape[1]))
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        page_size = st.selectbox("Rows per page:", PAGE_SIZES, index=2, key=f"{table}_page_size")
+    pages = -(-total // page_size)
+    with col2:
+        page = st.number_input(f"Page (of {pages}):", min_value=1, max_value=pages, value=1, step=1,
+                               key=f"{table}_page")
+    start = (page - 1) * page_size
+    # Only the visible page is serialized to the browser
+    with metrics.stage("render", table=table):
+        st.write(df.iloc[positions[start:start + page_size]])
+
+    parts = -(-total // EXPORT_ROWS)
+    with col3:
+        part = st.selectbox("Download rows:", range(1, parts + 1), key=f"{table}_part",
+                            format_func=lambda p: f"{(p - 1) * EXPORT_ROWS + 1:,}-{min(p * EXPORT_ROWS, total):,}")
+    with col4:
+        fmt = st.selectbox("Format:", list(export.FORMATS), key=f"{table}_format")
+    # Encoding a part is far slower than the search itself, so it only happens on request
+    if st.button("Prepare export", key=f"{table}_prepare"):
+        extension, mime = export.FORMATS[fmt]
+        st.download_button(f"Download {fmt.upper()}📥", results_export(df, table, search_term, part, fmt, version),
+                           file_name=f"{table}_{search_term}_{part}{extension}", mime=mime, key=f"{table}_download")
+
+
+@st.experimental_fragment
+def search_section(df, table, search_label, preview_title, shape_label, version):
+    # A fragment: typing in this search box reruns only this section, not the whole page
+    try:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            # Create Search bar
+            search_term = st.text_input(search_label, "")
+        fuzzy = False
+        if table in FUZZY_COLUMNS:
+            with col2:
+                fuzzy = st.toggle("Fuzzy match", key=f"{table}_fuzzy",
+                                  help="Closest English or local-language names, tolerating misspellings")
+
+        if search_term and fuzzy:
+            # Top matches by spelling distance, closest first
+            with metrics.stage("fuzzy_search", table=table):
+                positions, distances = load_fuzzy_index(table, version, df).search(search_term)
+            if len(positions):
+                st.write(df.iloc[positions].assign(**{"Match Distance": distances}))
+            else:
+                st.write(":red[Opps! No matching results found.]🤦‍♂️")
+
+        # Filter based on the names & LGD codes of this table
+        elif search_term:
+            with metrics.stage("search", table=table):
+                positions = search_cache(table, version, df).search(search_term)
 
-    profile_icon = "https://raw.githubusercontent.com/sjpradhan/lgd_hierarchy/main/Data/img_1.png"
+            # If there is invalid search it will show no matching found
+            if len(positions):
+                render_results(df, positions, table, search_term, version)
+            else:
+                st.write(":red[Opps! No matching results found.]🤦‍♂️")
 
-    # Fetch the image from URL
-    response = requests.get(profile_icon)
-    image = Image.open(BytesIO(response.content))
+        # Preview of the data
+        st.subheader(preview_title, divider="rainbow")
+        st.write(shape_label, df.shape)
+        st.write(df.head())
+    except Exception as e:
+        st.error(f"error in {table} data,{e}")
 
-    st.set_page_config(page_title="LGD Search Hierarchy", page_icon=image)
+
+def diagnostics_panel():
+    # Admin view of lgd.metrics, shown with ?debug=1 when the app runs with LGD_METRICS=1
+    with st.expander("Diagnostics🩺", expanded=True):
+        st.write(":orange[Stages]")
+        st.dataframe(pd.DataFrame(metrics.stage_rows()), use_container_width=True)
+        st.write(":orange[Caches]")
+        st.dataframe(pd.DataFrame(metrics.cache_rows()), use_container_width=True)
+        text = metrics.prometheus_text()
+        st.download_button("Download metrics📥", text, file_name="lgd_metrics.prom", mime="text/plain")
+        st.code(text, language="text")
+
+
+def main():
+
+    st.set_page_config(page_title="LGD Search Hierarchy", page_icon=Image.open(PROFILE_ICON))
+    version = data_version()
+    prefetch_lgd_data(version)
 
     st.title(":rainbow[LGD Hierarchy Data & Area Unit Converter]🗺️")
 
@@ -41,55 +211,27 @@ def main():
         col1, col2, col3, col4 = st.columns(4)
 
         with col4:
-            st.image(profile_icon)
+            st.image(PROFILE_ICON)
 
     except Exception as e:
         pass
-    # Conversion factors from each unit to square meters
-    conversion_factors = {
-        "Acre": 4046.86,
-        "Hectare": 10000,
-        "Bigha": 1337.8,
-        "Square meter": 1,
-        "Square feet": 0.092903,
-        "Biswa": 125.42,
-        "Guntha": 101.17,
-        "Square yard": 0.836127,
-        "Cent": 40.4686,
-        "Ground": 222.967,
-        "Biswani": 50.93,
-        "Dhur": 16.929,
-        "Kanal": 505.857,
-        "Katha": 126.441,
-        "Chatak": 33.528,
-        "Ghumao": 24281.13,
-        "Killa": 4046.86,
-        "Ankanam": 2.323,
-        "Decimal": 40.4686
-    }
-
-    # Function to convert from one unit to another
-    def convert_area(value, from_unit, to_unit):
-        value_in_sq_meters = value * conversion_factors[from_unit]
-        return value_in_sq_meters / conversion_factors[to_unit]
-
     st.header(":rainbow[Area Unit Converter]")
 
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader(":orange[Choose Unit]🤔")
-        from_unit = st.selectbox("From unit:", list(conversion_factors.keys()))
-        to_unit = st.selectbox("To unit:", list(conversion_factors.keys()))
+        from_unit = st.selectbox("From unit:", UNITS)
+        to_unit = st.selectbox("To unit:", UNITS)
         value = st.number_input("Enter the area value:", min_value=0.0, format="%.2f", step=1.0)
         # Perform the conversion
-        converted_value = convert_area(value, from_unit, to_unit)
+        converted_value = convert(value, from_unit, to_unit)
 
     with col2:
         # Add a slider to adjust the input value dynamically
         slider_value = st.slider("Adjust the area value:", min_value=0.0, max_value=10.0, value=0.0, step=0.1)
         if slider_value > 0:
-            slider_converted_value = convert_area(slider_value, from_unit, to_unit)
+            slider_converted_value = convert(slider_value, from_unit, to_unit)
             st.write(f"{slider_value} {from_unit} is equal to {slider_converted_value:.6f} {to_unit}")
 
     # Enable real-time updates
@@ -99,11 +241,9 @@ def main():
     # Add a table to show multiple conversions at once if there is a valid input value
     if value > 0:
         st.subheader(":orange[Multiple Conversions📔]")
-        conversion_results = {unit: convert_area(value, from_unit, unit) for unit in conversion_factors.keys()}
-        conversion_df = pd.DataFrame.from_dict(conversion_results, orient='index', columns=['Converted Value'])
-        conversion_df['Converted Value'] = conversion_df['Converted Value'].astype(str)
-        conversion_df.reset_index(inplace=True)
-        conversion_df.rename(columns={'index': 'Unit Type'}, inplace=True)
+        # One row of the precomputed factor matrix gives the value in every unit
+        conversion_df = pd.DataFrame({"Unit Type": UNITS,
+                                      "Converted Value": conversion_row(value, from_unit).astype(str)})
         st.table(conversion_df)
 
     st.header(":rainbow[Local Directory Data (LGD)]")
@@ -111,57 +251,35 @@ def main():
     st.divider()
 
     try:
-        @st.cache_data
-        def load_state_data():
-            state_url = "https://media.githubusercontent.com/media/sjpradhan/lgd_hierarchy/main/Data/State%20Details.csv"
-            state_df = pd.read_csv(state_url)
-            state_df = state_df[["State LGD Code"]]
-            return state_df
-        state_df = load_state_data()
-
-        @st.cache_data
-        def load_district_data():
-            district_url = "https://media.githubusercontent.com/media/sjpradhan/lgd_hierarchy/main/Data/District%20Details.csv"
-            district_df = pd.read_csv(district_url)
-            district_df = district_df[["District LGD Code"]]
-            return district_df
-        district_df = load_district_data()
-
-        @st.cache_data
-        def load_sub_district_data():
-            sub_district_url = "https://media.githubusercontent.com/media/sjpradhan/lgd_hierarchy/main/Data/Sub-districts%20Details.csv"
-            sub_district_df = pd.read_csv(sub_district_url)
-            sub_district_df = sub_district_df[["Sub-District LGD Code"]]
-            sub_district_df["Sub-District LGD Code"] = sub_district_df["Sub-District LGD Code"].astype(str)
-            return sub_district_df
-        sub_district_df = load_sub_district_data()
-
-        @st.cache_data
-        def load_village_data():
-            village_url = "https://media.githubusercontent.com/media/sjpradhan/lgd_hierarchy/main/Data/Village%20Details.csv"
-            village_df = pd.read_csv(village_url)
-            village_df = village_df[["Village Code",]]
-            village_df["Village Code"] = village_df["Village Code"].astype(str)
-            return village_df
-        village_df = load_village_data()
+        with st.spinner("Loading LGD data..."), metrics.stage("load_wait"):
+            lgd = load_lgd_data(version)
+    except Exception as e:
+        st.error(f"error in loading LGD data,{e}")
+        st.stop()
+
+    try:
+        # Counts are computed once per data version at ingest and stored with the dataset
+        kpis = lgd.metadata["kpis"]
 
         col1, col2, col3,col4 = st.columns(4)
 
         with col1:
-            unique_state = state_df["State LGD Code"].nunique()
-            st.metric(label= "**States / Union Territories**", value = unique_state)
+            st.metric(label= "**States / Union Territories**", value = kpis["states"])
 
         with col2:
-            unique_district = district_df["District LGD Code"].nunique()
-            st.metric(label="**Districts**", value=unique_district)
+            st.metric(label="**Districts**", value=kpis["districts"])
 
         with col3:
-            unique_sub_district = sub_district_df["Sub-District LGD Code"].nunique()
-            st.metric(label="**Sub-Districts**", value=unique_sub_district)
+            st.metric(label="**Sub-Districts**", value=kpis["sub_districts"])
 
         with col4:
-            unique_villages = village_df["Village Code"].nunique()
-            st.metric(label="**Villages**", value=unique_villages)
+            st.metric(label="**Villages**", value=kpis["villages"])
+
+        # Validated once at ingest; data with errors never gets this far (load_lgd_data raises)
+        report = lgd.metadata["validation"]
+        if report["warnings"]:
+            with st.expander(f"Data checks: {report['warnings']} warning(s)"):
+                st.table(pd.DataFrame(report["findings"], columns=["table", "message"]))
     except Exception as e:
         st.error(f"error occur in KPI,{e}")
         pass
@@ -182,246 +300,91 @@ def main():
     except Exception as e:
         pass
 
-    try:
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            # Create Search bar
-            search_term = st.text_input(":blue[Search by :green[State]/:orange[Code:]]🔎", "")
-    except Exception as e:
-        pass
-
-    try:
-        @st.cache_data
-        def load_state_data():
-            state_url = "https://media.githubusercontent.com/media/sjpradhan/lgd_hierarchy/main/Data/State%20Details.csv"
-            state_df = pd.read_csv(state_url)
-
-            state_df = state_df[["State LGD Code", "State Name (In English)", "State Name (In Local language)", "State or UT",
-            "Census2011 Code"]]
-
-            return state_df
-
-        state_df = load_state_data()
-
-
-        # Filter based on State Name & it's LGD code
-        if search_term:
-            filtered_records = state_df[
-                state_df['State Name (In English)'].str.contains(search_term, case=False) |
-                state_df['State LGD Code'].astype(str).str.contains(search_term)
-                ]
-
-            # If there is invalid search it will show no matching found
-            if not filtered_records.empty:
-                st.write(":blue[Filtered results:]", filtered_records.shape)
-                st.write(filtered_records)
-            else:
-                st.write(":red[Opps! No matching results found.]🤦‍♂️")
-
-        # Preview of state data
-        st.subheader(":orange[State Data Preview]🫣",divider='rainbow')
-        ":green[Rows & Columns In States]➡️", state_df.shape
-        st.write(state_df.head())
-    except Exception as e:
-        st.error(f"error in state data preview,{e}")
-        pass
+    search_section(lgd.states, "states", ":blue[Search by :green[State]/:orange[Code:]]🔎",
+                   ":orange[State Data Preview]🫣", ":green[Rows & Columns In States]➡️", lgd.version)
 
 # About Districts ---------------------------------------------------------------------------------------------|
-    try:
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            # Create Search bar
-            search_term = st.text_input(":blue[Search by :green[District]/:orange[Code:]]🔎", "")
-    except Exception as e:
-        pass
-
-    try:
-        @st.cache_data
-        def load_district_data():
-            district_url = "https://media.githubusercontent.com/media/sjpradhan/lgd_hierarchy/main/Data/District%20Details.csv"
-            district_df = pd.read_csv(district_url)
-
-            district_df = district_df[
-                ["District LGD Code", "District Name (In English)", "District Name (In Local language)",
-                 "Hierarchy", "Short Name of District", "Census2011 Code", "Pesa Status"]]
+    search_section(lgd.districts, "districts", ":blue[Search by :green[District]/:orange[Code:]]🔎",
+                   ":orange[District Data Preview]🫣", ":green[Rows & Columns In Districts]➡️", lgd.version)
 
-            return district_df
+# About Sub-Districts-------------------------------------------------------------------------------------------|
+    search_section(lgd.sub_districts, "sub_districts", ":blue[Search by :green[Sub-District]/:orange[Code:]]🔎",
+                   ":orange[Sub-District Data Preview]🫣", ":green[Rows & Columns In Sub-Districts➡️]", lgd.version)
 
-        district_df = load_district_data()
+# About Villages----------------------------------------------------------------------------------------------|
+    search_section(lgd.villages, "villages", ":blue[Search by :green[Village]/:orange[Code:]]🔎",
+                   ":orange[Villages Data Preview]🫣", ":green[Rows & Columns In Villages]", lgd.version)
 
-        # Filter based on District Name & it's LGD code
-        if search_term:
-            filtered_records = district_df[
-                district_df['District Name (In English)'].str.contains(search_term, case=False) |
-                district_df['District LGD Code'].astype(str).str.contains(search_term) |
-                district_df['Hierarchy'].str.contains(search_term, case=False)
-                ]
+# Drill Down---------------------------------------------------------------------------------------------------|
 
-            # If there is invalid search it will show no matching found
-            if not filtered_records.empty:
-                st.write(":blue[Filtered results:]",filtered_records.shape)
-                st.write(filtered_records)
-            else:
-                st.write(":red[Opps! No matching results found.]🤦‍♂️")
+    st.subheader(":orange[Drill Down🧭]", divider="rainbow")
 
-        # Preview of district data
-        st.subheader(":orange[District Data Preview]🫣",divider='rainbow')
-        ":green[Rows & Columns In Districts]➡️", district_df.shape
-        st.write(district_df.head())
-    except Exception as e:
-        st.error(f"error in district data,{e}")
-        pass
-
-# About Sub-Districts-------------------------------------------------------------------------------------------|
     try:
-        @st.cache_data
-        def load_sub_district_data():
-            sub_district_url = "https://media.githubusercontent.com/media/sjpradhan/lgd_hierarchy/main/Data/Sub-districts%20Details.csv"
-            sub_district_df = pd.read_csv(sub_district_url)
-
-            sub_district_df = sub_district_df[["Sub-District LGD Code","Sub-District Name (In English)",
-            "Sub-District Name (In Local language)","Hierarchy","Census2011 Code", "Pesa Status"]]
+        hierarchy = load_hierarchy(lgd.version, lgd)
 
-            sub_district_df["Sub-District LGD Code"] = sub_district_df["Sub-District LGD Code"].astype(str)
-            sub_district_df["Census2011 Code"].fillna(0, inplace=True)
-            sub_district_df["Census2011 Code"] = sub_district_df["Census2011 Code"].astype(int).astype(str)
-
-            return sub_district_df
-
-        sub_district_df = load_sub_district_data()
+        def by_name(level, codes):
+            return sorted((int(code) for code in codes), key=lambda code: hierarchy.name(level, code))
 
         col1, col2, col3 = st.columns(3)
-
         with col1:
-            # Create Search bar
-            search_term = st.text_input(":blue[Search by :green[Sub-District]/:orange[Code:]]🔎", "")
-
-        # Filter based on Sub-District Name & it's LGD code
-        if search_term:
-            filtered_records = sub_district_df[
-                sub_district_df['Sub-District Name (In English)'].str.contains(search_term, case=False) |
-                sub_district_df['Sub-District LGD Code'].astype(str).str.contains(search_term) |
-                sub_district_df['Hierarchy'].astype(str).str.contains(search_term, case=False)
-                ]
-
-            # If there is invalid search it will show no matching found
-            if not filtered_records.empty:
-                st.write(":blue[Filtered results:]",filtered_records.shape)
-                st.write(filtered_records)
-            else:
-                st.write(":red[Opps! No matching results found.]🤦‍♂️")
-
-        # Preview of sub-district data
-        st.subheader(":orange[Sub-District Data Preview]🫣",divider = "rainbow")
-        ":green[Rows & Columns In Sub-Districts➡️]", sub_district_df.shape
-        st.write(sub_district_df.head())
-    except Exception as e:
-        st.error(f"error in sub-district data, {e}")
-        pass
-
-
-# About Villages----------------------------------------------------------------------------------------------|
-
-    try:
-        @st.cache_data
-        def load_village_data():
-            village_url = "https://media.githubusercontent.com/media/sjpradhan/lgd_hierarchy/main/Data/Village%20Details.csv"
-            village_df = pd.read_csv(village_url)
-            village_df = village_df[["State Code","State Name (In English)","District Code","District Name (In English)",
-                        "Sub-District Code","Sub-District Name (In English)","Village Code","Village Version",
-                        "Village Name (In English)","Village Name (In Local)","Village Status","Census 2011 Code"]]
-            village_df["Village Code"] = village_df["Village Code"].astype(str)
-            village_df["Census 2011 Code"].fillna(0, inplace=True)
-            village_df["Sub-District Code"].fillna(0, inplace = True)
-            village_df["Census 2011 Code"] = village_df["Census 2011 Code"].astype(int).astype(str)
-            village_df["Sub-District Code"] = village_df["Sub-District Code"].astype(int).astype(str)
-
-            return village_df
-        village_df = load_village_data()
-
+            state_code = st.selectbox("State:", by_name("states", hierarchy.codes["states"]),
+                                      format_func=lambda code: hierarchy.name("states", code))
+        with col2:
+            district_code = st.selectbox("District:", by_name("districts", hierarchy.children("states", state_code)),
+                                         format_func=lambda code: hierarchy.name("districts", code))
+        # A state without districts leaves the District box empty (None), with nothing to list below it
+        sub_districts = [] if district_code is None else hierarchy.children("districts", district_code)
+        with col3:
+            sub_district_code = st.selectbox(
+                "Sub-District:", [None] + by_name("sub_districts", sub_districts),
+                format_func=lambda code: "All" if code is None else hierarchy.name("sub_districts", code))
+
+        if district_code is None:
+            st.write(":red[Opps! No districts found for this state.]🤦‍♂️")
+        elif sub_district_code is None:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric(label="**Sub-Districts**", value=hierarchy.count("districts", district_code, "sub_districts"))
+            with col2:
+                st.metric(label="**Villages**", value=hierarchy.count("districts", district_code, "villages"))
+
+            positions = hierarchy.descendants("districts", district_code)
+            st.write(pd.DataFrame({
+                "Sub-District LGD Code": hierarchy.codes["sub_districts"][positions],
+                "Sub-District Name (In English)": hierarchy.names["sub_districts"][positions],
+                "Villages": hierarchy.counts("sub_districts", "villages")[positions],
+            }))
+        else:
+            st.metric(label="**Villages**", value=hierarchy.count("sub_districts", sub_district_code, "villages"))
+            village_df = lgd.villages
+            with metrics.stage("render", table="drill_down"):
+                st.write(village_df.iloc[hierarchy.descendants("sub_districts", sub_district_code)])
+
+        # Export every village under the chosen level of the selection
+        scopes = [(level, code) for level, code in [("states", state_code), ("districts", district_code),
+                                                    ("sub_districts", sub_district_code)] if code is not None]
         col1, col2, col3 = st.columns(3)
-
         with col1:
-            # Create Search bar
-            search_term = st.text_input(":blue[Search by :green[Village]/:orange[Code:]]🔎", "")
-
-        # Filter based on Sub-District Name & it's LGD code
-        if search_term:
-            filtered_records = village_df[
-                village_df['Village Name (In English)'].str.contains(search_term, case=False) |
-                village_df['Village Code'].astype(str).str.contains(search_term) |
-                village_df['State Code'].astype(str).str.contains(search_term) |
-                village_df['State Name (In English)'].str.contains(search_term, case=False) |
-                village_df['District Code'].astype(str).str.contains(search_term) |
-                village_df['District Name (In English)'].str.contains(search_term, case=False) |
-                village_df['Sub-District Code'].astype(str).str.contains(search_term) |
-                village_df['Sub-District Name (In English)'].str.contains(search_term, case=False)
-                ]
-
-            # If there is invalid search it will show no matching found
-            if not filtered_records.empty:
-                st.write(":blue[Filtered results:]",filtered_records.shape)
-                st.write(filtered_records)
-            else:
-                st.write(":red[Opps! No matching results found.]🤦‍♂️")
-
-        # Preview of sub-district data
-        st.subheader(":orange[Villages Data Preview]🫣",divider="rainbow")
-        ":green[Rows & Columns In Villages]", village_df.shape
-        st.write(village_df.head())
-
+            level, code = st.selectbox("Export villages of:", scopes, index=len(scopes) - 1,
+                                       format_func=lambda scope: hierarchy.name(*scope))
+        with col2:
+            fmt = st.selectbox("Format:", list(export.FORMATS), key="drill_down_format")
+        with col3:
+            prepare = st.button("Prepare export", key="drill_down_prepare")
+        if prepare:
+            extension, mime = export.FORMATS[fmt]
+            st.download_button(f"Download {fmt.upper()}📥", subtree_export(lgd.villages, hierarchy, level, code,
+                                                                          "villages", fmt),
+                               file_name=f"villages_{hierarchy.name(level, code)}{extension}", mime=mime,
+                               key="drill_down_download")
     except Exception as e:
-        st.error(f"error in village data,{e}")
+        st.error(f"error in drill down,{e}")
         pass
 
     st.subheader(":orange[State Wise Records📈]", divider="rainbow")
 
     try:
-        @st.cache_data
-        def loading_district_data():
-            district_url = "https://media.githubusercontent.com/media/sjpradhan/lgd_hierarchy/main/Data/District%20Details.csv"
-            district_df = pd.read_csv(district_url)
-            district_df["Hierarchy"] = district_df["Hierarchy"].str.replace(r"\(State\)", "").str.split("(").str.get(
-                0).str.strip()
-            districts_count = district_df["Hierarchy"].value_counts().reset_index()
-            return districts_count
-        districts_count = loading_district_data()
-
-        @st.cache_data
-        def loading_sub_district_data():
-            sub_district_url = "https://media.githubusercontent.com/media/sjpradhan/lgd_hierarchy/main/Data/Sub-districts%20Details.csv"
-            sub_district_df = pd.read_csv(sub_district_url)
-            sub_district_df = sub_district_df[["Hierarchy"]]
-            sub_district_df["Hierarchy"] = sub_district_df["Hierarchy"].str.replace(r"\(State\)", "").str.split("(").str.get(
-                1).str.strip()
-            sub_district_df["Hierarchy"] = sub_district_df["Hierarchy"].str.replace("District\) / ", "", regex=True)
-            sub_district_count = sub_district_df["Hierarchy"].value_counts().reset_index()
-            replacements = {
-                "Bhabua)": "Bihar",
-                "East Nimar)": "Madhya Pradesh",
-                "West Nimar)": "Madhya Pradesh"
-            }
-            sub_district_count["Hierarchy"] = sub_district_count["Hierarchy"].replace(replacements)
-            sub_district_count = sub_district_count.groupby("Hierarchy")["count"].sum().reset_index()
-            return sub_district_count
-        sub_district_count = loading_sub_district_data()
-
-        @st.cache_data
-        def loading_village_data():
-            village_url = "https://media.githubusercontent.com/media/sjpradhan/lgd_hierarchy/main/Data/Village%20Details.csv"
-            village_df = pd.read_csv(village_url)
-            village_df = village_df[["State Name (In English)"]]
-            village_count = village_df["State Name (In English)"].value_counts().reset_index()
-
-            df_merge = pd.merge(districts_count, sub_district_count, how="left", on="Hierarchy")
-            df_merge = pd.merge(df_merge, village_count, how="left", left_on="Hierarchy", right_on="State Name (In English)")
-            stats_table = df_merge[["Hierarchy", "count_x", "count_y", "count"]]
-            stats_table["count"].fillna(0, inplace=True)
-            stats_table["count"] = stats_table["count"].astype(int)
-            rename_column = ["States", "Districts", "Sub-Districts", "Villages"]
-            stats_table.columns = rename_column
-            return stats_table
-        stats_table = loading_village_data()
+        stats_table = pd.DataFrame(lgd.metadata["state_wise_records"], columns=STATE_WISE_COLUMNS)
 
         st.table(stats_table)
         st.caption("**Update till June 2024, To get latest LGD Data Please visit LGD Official site.**")
@@ -429,6 +392,10 @@ def main():
         st.error(f"error in table data,{e}")
         pass
 
+    if metrics.ENABLED and st.query_params.get("debug") == "1":
+        diagnostics_panel()
+    metrics.export()
+
     st.divider()
 
     # col1,col2 = st.columns(2)
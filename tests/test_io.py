@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from lgd.io import ChunkWriter, read_chunks
+from lgd.units import convert, convert_file
+
+ROWS = pd.DataFrame({
+    "Area": [1.0, 2.5, 4.0, 0.5, 10.0, 3.0],
+    "Unit": ["Acre", "Hectare", "Bigha", "Acre", None, "Acre"],
+    # Empty in the first chunk, then text and then numbers: inferred per chunk, the types would differ
+    "Note": [None, None, "boundary", "survey 12", "7", None],
+    "Plot": [1, 2, 3, None, 5, 6],
+})
+
+
+def test_read_chunks_types_are_the_same_in_every_chunk(tmp_path):
+    ROWS.to_csv(tmp_path / "plots.csv", index=False)
+    chunks = list(read_chunks(str(tmp_path / "plots.csv"), 2, dtype={"Area": "float64"}))
+    assert len(chunks) == 3
+    assert all(list(chunk.dtypes) == list(chunks[0].dtypes) for chunk in chunks)
+    assert chunks[0]["Area"].dtype == "float64"
+
+
+def test_chunk_writer_keeps_the_first_chunks_schema(tmp_path):
+    output = str(tmp_path / "out.parquet")
+    with ChunkWriter(output) as writer:
+        writer.write(pd.DataFrame({"code": [1, 2], "name": [None, None]}))
+        writer.write(pd.DataFrame({"code": [3, 4], "name": ["Rampur", None]}))
+    table = pq.read_table(output)
+    assert writer.rows == 4
+    assert table.column("name").to_pylist() == [None, None, "Rampur", None]
+
+
+def test_convert_file_to_parquet_in_several_chunks(tmp_path):
+    ROWS.to_csv(tmp_path / "plots.csv", index=False)
+    rows = convert_file(str(tmp_path / "plots.csv"), str(tmp_path / "plots.parquet"), "Area", "Acre",
+                        unit_column="Unit", chunksize=2)
+    df = pq.read_table(tmp_path / "plots.parquet").to_pandas()
+    assert rows == len(df) == len(ROWS)
+    assert df["Note"].tolist()[2:5] == ["boundary", "survey 12", "7"]
+    np.testing.assert_allclose(df["Area (Acre)"].to_numpy()[:2], [1.0, convert(2.5, "Hectare", "Acre")])
+    assert np.isnan(df["Area (Acre)"].iloc[4])  # no unit
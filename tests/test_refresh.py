@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lgd import cache, data, refresh
+
+CODE_COLUMNS = {"states": "State LGD Code", "districts": "District LGD Code",
+                "sub_districts": "Sub-District LGD Code", "villages": "Village Code"}
+BASE_URL = "http://127.0.0.1:9/"  # never fetched: every CSV is local
+
+
+def write_release(directory, villages: pd.DataFrame, states=None) -> None:
+    """A small but consistent LGD release: 2 states, 4 districts, 8 sub-districts and ``villages``."""
+    directory.mkdir(parents=True, exist_ok=True)
+    states = states if states is not None else pd.DataFrame({
+        "State LGD Code": [1, 2], "State Name (In English)": ["Bihar", "Goa"],
+        "State Name (In Local language)": ["बिहार", "गोंय"], "State or UT": ["S", "S"], "Census2011 Code": [10, 30]})
+    state_names = dict(zip(states["State LGD Code"], states["State Name (In English)"]))
+    districts = pd.DataFrame({
+        "District LGD Code": [11, 12, 21, 22], "District Name (In English)": ["Patna", "Gaya", "North Goa", "South Goa"],
+        "District Name (In Local language)": ["x"] * 4,
+        "Hierarchy": [f"{state_names[code // 10]}(State)" for code in [11, 12, 21, 22]],
+        "Short Name of District": ["s"] * 4, "Census2011 Code": [101, 102, 301, 302], "Pesa Status": ["N"] * 4})
+    district_names = dict(zip(districts["District LGD Code"], districts["District Name (In English)"]))
+    codes = [district * 10 + k for district in district_names for k in range(2)]
+    sub_districts = pd.DataFrame({
+        "Sub-District LGD Code": codes, "Sub-District Name (In English)": [f"Tehsil {code}" for code in codes],
+        "Sub-District Name (In Local language)": ["y"] * len(codes),
+        "Hierarchy": [f"{district_names[code // 10]}(District) / {state_names[code // 100]}(State)" for code in codes],
+        "Census2011 Code": [np.nan if code % 3 == 0 else 1000 + code for code in codes], "Pesa Status": ["N"] * len(codes)})
+    states.to_csv(directory / data.STATE_FILE, index=False)
+    districts.to_csv(directory / data.DISTRICT_FILE, index=False)
+    sub_districts.to_csv(directory / data.SUB_DISTRICT_FILE, index=False)
+    villages.to_csv(directory / data.VILLAGE_FILE, index=False)
+
+
+def make_villages(codes, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    sub_district = rng.choice([110, 111, 120, 121, 210, 211, 220, 221], len(codes))
+    return pd.DataFrame({
+        "State Code": sub_district // 100, "State Name (In English)": np.where(sub_district // 100 == 1, "Bihar", "Goa"),
+        "District Code": sub_district // 10,
+        "District Name (In English)": pd.Series(sub_district // 10).map(
+            {11: "Patna", 12: "Gaya", 21: "North Goa", 22: "South Goa"}).to_numpy(),
+        "Sub-District Code": sub_district, "Sub-District Name (In English)": [f"Tehsil {code}" for code in sub_district],
+        "Village Code": codes, "Village Version": rng.integers(1, 4, len(codes)),
+        "Village Name (In English)": [f"Village {code}" for code in codes], "Village Name (In Local)": ["गांव"] * len(codes),
+        "Village Status": ["Inhabitant"] * len(codes),
+        "Census 2011 Code": [np.nan if code % 7 == 0 else 500000 + code for code in codes]})
+
+
+def sorted_table(dataset: data.LGDDataset, table: str) -> pd.DataFrame:
+    return getattr(dataset, table).sort_values(CODE_COLUMNS[table]).reset_index(drop=True).astype(str)
+
+
+def test_diff_finds_changes_without_a_version_bump():
+    old = make_villages(np.arange(100, 110))
+    new = old.copy()
+    new.loc[2, "Village Name (In English)"] = "Renamed"  # Village Version left as it was
+    new.loc[3, "Census 2011 Code"] = np.nan
+    new.loc[4, "Village Version"] += 1
+    new = pd.concat([new.drop(index=[0]), make_villages([200])], ignore_index=True)
+
+    changes = refresh.diff(data.apply_dtypes(old, data.VILLAGE_DTYPES), data.apply_dtypes(new, data.VILLAGE_DTYPES),
+                           "Village Code")
+    assert changes.added.tolist() == [200]
+    assert changes.removed.tolist() == [100]
+    assert sorted(changes.changed.tolist()) == [102, 103, 104]
+
+
+def test_diff_of_identical_tables_is_empty():
+    df = data.apply_dtypes(make_villages(np.arange(100, 150)), data.VILLAGE_DTYPES)
+    assert not refresh.diff(df, df.copy(), "Village Code")
+
+
+def test_diff_refuses_duplicate_codes():
+    df = make_villages([100, 100, 101])
+    with pytest.raises(ValueError):
+        refresh.diff(df, df, "Village Code")
+
+
+@pytest.fixture
+def releases(tmp_path):
+    old = make_villages(np.arange(100_000, 102_000))
+    rng = np.random.default_rng(1)
+    new = old.drop(index=rng.choice(len(old), 50, replace=False)).reset_index(drop=True)
+    renamed = rng.choice(len(new), 80, replace=False)
+    new.loc[renamed[:40], "Village Name (In English)"] = [f"Renamedpur {i}" for i in range(40)]
+    new.loc[renamed[40:], "Village Version"] += 1
+    moved = renamed[:10]
+    new.loc[moved, ["State Code", "State Name (In English)", "District Code", "District Name (In English)",
+                    "Sub-District Code", "Sub-District Name (In English)"]] = [2, "Goa", 22, "South Goa", 221, "Tehsil 221"]
+    new = pd.concat([new, make_villages(np.arange(900_000, 900_120), seed=2)], ignore_index=True)
+    write_release(tmp_path / "old", old)
+    write_release(tmp_path / "new", new)
+    return tmp_path
+
+
+def test_refresh_matches_a_full_rebuild(releases):
+    refreshed, rebuilt = releases / "refreshed", releases / "rebuilt"
+    data.ingest(releases / "old", refreshed, BASE_URL)
+    changes = refresh.refresh(releases / "new", refreshed, BASE_URL)
+    assert set(changes) == {"villages"}
+    assert (len(changes["villages"].added), len(changes["villages"].removed),
+            len(changes["villages"].changed)) == (120, 50, 80)
+
+    data.ingest(releases / "new", rebuilt, BASE_URL)
+    assert cache.data_version(refreshed) == cache.data_version(rebuilt)
+    a = data.load_dataset(BASE_URL, releases / "new", refreshed)
+    b = data.load_dataset(BASE_URL, releases / "new", rebuilt)
+    for table in data.TABLES:
+        assert list(getattr(a, table).dtypes) == list(getattr(b, table).dtypes)
+        pd.testing.assert_frame_equal(sorted_table(a, table), sorted_table(b, table))
+    for key in ("kpis", "state_wise_records", "validation"):
+        assert a.metadata[key] == b.metadata[key]
+
+
+def test_refresh_of_an_unchanged_release_changes_nothing(releases):
+    cache_dir = releases / "cache"
+    data.ingest(releases / "old", cache_dir, BASE_URL)
+    version = cache.data_version(cache_dir)
+    assert refresh.refresh(releases / "old", cache_dir, BASE_URL) == {}
+    assert cache.data_version(cache_dir) == version
+
+
+def test_refresh_replaces_a_table_other_than_villages(releases):
+    cache_dir = releases / "cache"
+    data.ingest(releases / "old", cache_dir, BASE_URL)
+    states = pd.read_csv(releases / "old" / data.STATE_FILE)
+    states.loc[1, "State Name (In Local language)"] = "गोवा"
+    write_release(releases / "old", pd.read_csv(releases / "old" / data.VILLAGE_FILE), states)
+
+    changes = refresh.refresh(releases / "old", cache_dir, BASE_URL)
+    assert set(changes) == {"states"} and changes["states"].changed.tolist() == [2]
+    dataset = data.load_dataset(BASE_URL, releases / "old", cache_dir)
+    assert dataset.states["State Name (In Local language)"].tolist() == ["बिहार", "गोवा"]
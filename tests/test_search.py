@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lgd import search
+from lgd.search import ColumnIndex, SearchCache, SearchIndex, TrigramPostings, to_codepoints, trigram_keys
+
+COLUMNS = ["name", "code", "label"]
+TERMS = ["", "a", "RA", "ram", "Rampur", "pur", "ur ", "12", "7", "0", "zzz", "पुर", "rampur rampur", "ā"]
+
+
+def make_frame(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    stems = np.array(["Rampur", "rampur", "RAMPUR", "Sitapur", "Ram Nagar", "Aurangabad", "रामपुर", "Pūrṇa"])
+    names = [f"{stem}{suffix}" for stem, suffix in zip(rng.choice(stems, n), rng.choice(["", " 1", "a", "ur"], n))]
+    names = pd.Series(names, dtype="string[pyarrow]")
+    names[rng.random(n) < 0.05] = pd.NA
+    label = pd.Series(rng.choice(["Rampur / Uttar Pradesh", "Pune / Maharashtra", None], n), dtype="category")
+    return pd.DataFrame({"name": names, "code": rng.integers(1, 100_000, n), "label": label})
+
+
+def expected_rows(df: pd.DataFrame, term: str, columns=COLUMNS) -> np.ndarray:
+    matched = np.zeros(len(df), dtype=bool)
+    for column in columns:
+        values = df[column]
+        contains = values.astype(str).str.contains(term, case=False, regex=False)
+        matched |= (contains & values.notna()).to_numpy(dtype=bool)
+    return np.flatnonzero(matched)
+
+
+@pytest.fixture(scope="module")
+def frame() -> pd.DataFrame:
+    return make_frame(3000, seed=0)
+
+
+def test_trigram_postings_match_brute_force():
+    values = ["rampur", "ram", "pur", "", "rampur", "ampu", "xy"]
+    text = "\x00".join(values) + "\x00"
+    postings = TrigramPostings(to_codepoints(text))
+    for key in postings.keys:
+        ids = postings.get(key)
+        trigram = "".join(chr((int(key) >> shift) & 0x1FFFFF) for shift in (42, 21, 0))
+        assert list(ids) == [i for i, value in enumerate(values) if trigram in value]
+    assert len(postings.get(trigram_keys(to_codepoints("zzz"))[0])) == 0
+
+
+def test_trigram_postings_of_short_text():
+    postings = TrigramPostings(to_codepoints("a\x00"))
+    assert len(postings.keys) == 0
+    assert len(postings.get(np.uint64(1))) == 0
+
+
+@pytest.mark.parametrize("term", TERMS)
+def test_search_matches_str_contains(frame, term):
+    index = SearchIndex(frame, COLUMNS)
+    np.testing.assert_array_equal(index.search(term), expected_rows(frame, term))
+    np.testing.assert_array_equal(index.search(term, ["name"]), expected_rows(frame, term, ["name"]))
+
+
+def test_case_variants_are_all_found():
+    df = pd.DataFrame({"name": ["Rampur", "rampur", "Sitapur", "RAMPUR"]})
+    np.testing.assert_array_equal(SearchIndex(df, ["name"]).search("rampur"), [0, 1, 3])
+
+
+def test_updated_matches_rebuild(frame):
+    rng = np.random.default_rng(1)
+    # Drop some rows, reorder the rest and append rows with values the index has not seen
+    kept = frame.iloc[rng.permutation(len(frame))[:2500]]
+    added = make_frame(400, seed=2)
+    added["name"] = ("New" + added["name"].astype(str)).astype("string[pyarrow]")
+    refreshed = pd.concat([kept, added], ignore_index=True)
+    refreshed["label"] = refreshed["label"].astype("category")
+
+    updated = SearchIndex(frame, COLUMNS).updated(refreshed)
+    rebuilt = SearchIndex(refreshed, COLUMNS)
+    for term in TERMS + ["new", "newram", "NewSitapur"]:
+        np.testing.assert_array_equal(updated.search(term), rebuilt.search(term))
+        np.testing.assert_array_equal(updated.search(term), expected_rows(refreshed, term))
+
+    # A second refresh builds on the first one's added values
+    again = refreshed.iloc[::-1].reset_index(drop=True)
+    for term in ["new", "pur", "ram"]:
+        np.testing.assert_array_equal(updated.updated(again).search(term), expected_rows(again, term))
+
+
+def test_updated_leaves_the_original_untouched(frame):
+    index = ColumnIndex(frame["name"])
+    before = index.search("ram")
+    index.updated(frame["name"].iloc[:10].reset_index(drop=True))
+    np.testing.assert_array_equal(index.search("ram"), before)
+
+
+@pytest.mark.parametrize("scan_rows", [0, search.REFINE_SCAN_ROWS])
+def test_refine_matches_search(frame, monkeypatch, scan_rows):
+    # scan_rows 0 sends every refinement through the index instead of testing rows one by one
+    monkeypatch.setattr(search, "REFINE_SCAN_ROWS", scan_rows)
+    index = SearchIndex(frame, COLUMNS)
+    for base, term in [("ram", "rampur"), ("pur", "pur 1"), ("a", "ram nagar"), ("7", "77")]:
+        np.testing.assert_array_equal(index.refine(index.search(base), term), expected_rows(frame, term))
+
+
+def test_search_cache_refines_typed_queries(frame):
+    cache = SearchCache(SearchIndex(frame, COLUMNS), max_entries=4)
+    for n in range(1, len("Rampur a") + 1):
+        term = "Rampur a"[:n]
+        np.testing.assert_array_equal(cache.search(term), expected_rows(frame, term))
+    assert len(cache._results) == 4
+    rows = cache.search("rampur a")
+    assert not rows.flags.writeable
+
+
+def test_search_cache_updated_leaves_the_previous_version_alone(frame):
+    previous = SearchCache(SearchIndex(frame, COLUMNS), max_entries=8, version="a")
+    before = previous.search("ram")
+    smaller = frame.iloc[:100].reset_index(drop=True)
+    refreshed = previous.updated(smaller, "b")
+    assert (refreshed.version, refreshed.max_entries) == ("b", 8)
+    np.testing.assert_array_equal(refreshed.search("ram"), expected_rows(smaller, "ram"))
+    assert previous.version == "a"
+    np.testing.assert_array_equal(previous.search("ram"), before)
+    np.testing.assert_array_equal(previous.search("rampur"), expected_rows(frame, "rampur"))